@@ -0,0 +1,11 @@
+"""Shared helpers for the QuizHub Telegram scripts (send_polls, forwarder, bulk delete)."""
+import os
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Small files that should survive between workflow runs (learned rates, journals, ...).
+STATE_DIR = os.getenv("QUIZHUB_STATE_DIR", os.path.join(REPO_ROOT, "state"))
+
+# Bot API server the scripts talk to; point it at tools/fake_bot_api.py for local benchmarks.
+OFFICIAL_API_URL = "https://api.telegram.org"
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", OFFICIAL_API_URL).rstrip("/")
@@ -0,0 +1,91 @@
+"""
+Shards sending to one channel across several bots.
+
+Telegram's flood limits are per bot, so N bots that are all admins of the
+destination channel can post roughly N times as fast as one. BOT_TOKENS lists
+the extra tokens (comma- or whitespace-separated); BOT_TOKEN stays the primary
+bot, which also posts to the log channel.
+
+Each bot keeps its own limiter. ``BotPool.acquire(chat_id)`` hands out the bot
+that can send soonest, preferring the least recently used on ties, so a bot
+under RetryAfter simply stops being picked until its flood wait is over while
+the others carry on. Callers keep sending one item at a time, awaiting each
+call before starting the next, so the channel order stays strict no matter
+which bot posted what.
+"""
+import os
+import re
+
+from common.flood import bot_id_from_token
+
+
+def pool_tokens(primary=None, extra=None):
+    """BOT_TOKEN first, then BOT_TOKENS, without duplicates or blanks."""
+    primary = os.getenv("BOT_TOKEN") if primary is None else primary
+    extra = os.getenv("BOT_TOKENS", "") if extra is None else extra
+    tokens = []
+    for token in [primary or "", *re.split(r"[\s,]+", extra)]:
+        token = token.strip()
+        if token and token not in tokens:
+            tokens.append(token)
+    return tokens
+
+
+class PoolMember:
+    """One bot of the pool with its own limiter and counters."""
+
+    def __init__(self, bot, limiter, bot_id):
+        self.bot = bot
+        self.limiter = limiter
+        self.bot_id = bot_id
+        self.sent = 0
+        self.floods = 0
+        self.last_used = 0
+
+    def on_success(self, chat_id):
+        self.sent += 1
+        self.limiter.on_success(chat_id)
+
+    def on_retry_after(self, chat_id, retry_after):
+        self.floods += 1
+        self.limiter.on_retry_after(chat_id, retry_after)
+
+
+class BotPool:
+    def __init__(self, members):
+        if not members:
+            raise ValueError("A bot pool needs at least one bot token.")
+        self.members = list(members)
+        self._turn = 0
+
+    @classmethod
+    def from_tokens(cls, tokens, make_bot, make_limiter):
+        """`make_bot(token)` and `make_limiter(token)` build one member's bot and limiter."""
+        return cls([PoolMember(make_bot(token), make_limiter(token), bot_id_from_token(token)) for token in tokens])
+
+    @property
+    def bot(self):
+        """The primary bot, for calls that are not sharded (log channel, setup)."""
+        return self.members[0].bot
+
+    def __len__(self):
+        return len(self.members)
+
+    def pick(self, chat_id):
+        """The member whose limiter would let it send to `chat_id` soonest."""
+        return min(self.members, key=lambda member: (member.limiter.delay(chat_id), member.last_used))
+
+    async def acquire(self, chat_id):
+        """Waits for the chosen member's budget and returns it; report the outcome on the member."""
+        member = self.pick(chat_id)
+        await member.limiter.acquire(chat_id)
+        self._turn += 1
+        member.last_used = self._turn
+        return member
+
+    def save(self):
+        for member in self.members:
+            member.limiter.save()
+
+    def summary(self):
+        return "; ".join(f"bot {m.bot_id}: {m.sent} sent, {m.floods} flood waits" for m in self.members)
@@ -0,0 +1,247 @@
+"""
+Deck parsing, validation and the compiled deck format.
+
+Two source schemas exist: questions.json items carry the answer as a
+`correct_option` index, quizzes/**.json questions carry it as `answer` text (or a
+`correctAnswer` index) and may be wrapped in {title, description, questions}.
+normalize_question() maps both to the send_polls item shape.
+
+A compiled deck (``*.deck.jsonl``) is that shape after validation: a header line
+followed by one slot-based record per line, a JSON array laid out as DECK_FIELDS.
+Records hold the answer index, the prefixed Telegram length and the content
+fingerprint, so send_polls can stream them without re-validating or re-hashing.
+"""
+import json
+import logging
+import os
+
+from common.textlimits import telegram_len
+
+QUESTION_PREFIX = "[MediX]\n"
+
+LIMITS = {
+    "POLL_QUESTION": 300,
+    "POLL_OPTION": 100,
+    "POLL_EXPLANATION": 200,
+    "POLL_MAX_OPTIONS": 10,
+    "MESSAGE_TEXT": 4096
+}
+# Quiz explanations may contain at most this many line feeds.
+POLL_EXPLANATION_MAX_LINE_FEEDS = 2
+
+DECK_FORMAT = "quizhub-deck"
+DECK_VERSION = 1
+DECK_SUFFIX = ".deck.jsonl"
+# Slot order of a compiled record; `text` is the question for polls.
+DECK_FIELDS = ("type", "text", "options", "correct_option", "explanation", "length", "fingerprint")
+
+
+def iter_items(file_path, chunk_size=1 << 16):
+    """
+    Yields the items of a top-level JSON array one at a time, reading the file in
+    chunks so a multi-megabyte deck is never held in memory as a whole.
+    Raises json.JSONDecodeError for malformed input.
+    """
+    decoder = json.JSONDecoder()
+    with open(file_path, 'r', encoding='utf-8') as f:
+        buffer, pos, eof = "", 0, False
+
+        def fill():
+            nonlocal buffer, pos, eof
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+
+        def skip_whitespace():
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos].isspace():
+                    pos += 1
+                if pos < len(buffer) or eof:
+                    return
+                fill()
+
+        fill()
+        skip_whitespace()
+        if buffer[pos:pos + 1] != "[":
+            raise json.JSONDecodeError("Expected a JSON array of items", buffer, pos)
+        pos += 1
+        expect_item = True
+        while True:
+            skip_whitespace()
+            if pos >= len(buffer):
+                raise json.JSONDecodeError("Unterminated JSON array", buffer, pos)
+            if buffer[pos] == "]":
+                return
+            if not expect_item:
+                if buffer[pos] != ",":
+                    raise json.JSONDecodeError("Expected ',' between items", buffer, pos)
+                pos += 1
+                skip_whitespace()
+            while True:
+                try:
+                    item, pos = decoder.raw_decode(buffer, pos)
+                    break
+                except json.JSONDecodeError:
+                    # Most likely the item straddles a chunk boundary; only fail once the file is exhausted.
+                    if eof:
+                        raise
+                    fill()
+            expect_item = False
+            yield item
+
+
+def iter_source_questions(file_path):
+    """Raw questions from either source layout: a bare JSON array, or an object with a `questions` list."""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        head = f.read(256).lstrip()
+    if head.startswith("{"):
+        with open(file_path, 'r', encoding='utf-8') as f:
+            yield from json.load(f).get("questions", [])
+    else:
+        yield from iter_items(file_path)
+
+
+def normalize_question(raw):
+    """
+    Maps any source schema to the send_polls item shape, converting a textual
+    `answer` or a `correctAnswer` index into `correct_option`.
+    Raises ValueError when a textual answer matches none of the options or an
+    index is not a valid option position.
+    """
+    if raw.get('type', 'poll') == 'message':
+        return {"type": "message", "text": raw.get('text', '')}
+    options = raw.get('options', [])
+    correct = raw.get('correct_option', raw.get('correctAnswer'))
+    if correct is None and raw.get('answer') is not None:
+        answer = str(raw['answer']).strip()
+        stripped = [str(option).strip() for option in options]
+        if answer not in stripped:
+            raise ValueError(f"Answer '{raw['answer']}' is not one of the options.")
+        correct = stripped.index(answer)
+    elif correct is not None and not is_option_index(correct, options):
+        raise ValueError(f"Correct answer index {correct!r} is not an option position (0-{len(options) - 1}).")
+    item = {"type": "poll", "question": raw.get('question', ''), "options": options, "correct_option": correct}
+    if raw.get('explanation'):
+        item["explanation"] = raw['explanation']
+    return item
+
+
+def is_option_index(value, options):
+    # bool is an int subclass, but `true` is not an option position.
+    return isinstance(value, int) and not isinstance(value, bool) and 0 <= value < len(options)
+
+
+def validate_item(i, item, prefix=QUESTION_PREFIX, location=None):
+    """
+    Returns the list of validation errors for one item; limit warnings are logged directly.
+    Errors and warnings name the item by `location` (e.g. "quizzes/a.json question #3")
+    when given, else as "Item #<i+1>".
+    """
+    errors = []
+    label = location or f"Item #{i+1}"
+    content_type = item.get('type', 'poll')
+    # Lengths are counted the way Telegram counts them: UTF-16 units of the entity-stripped text.
+    if content_type == 'poll':
+        question, options, explanation = item.get('question',''), item.get('options',[]), item.get('explanation','')
+        prefixed_question_len = telegram_len(prefix + question)
+        
+        if not question: errors.append(f"{label}: Poll question is empty.")
+        if prefixed_question_len > LIMITS["POLL_QUESTION"]: 
+            errors.append(f"{label}: Prefixed question length ({prefixed_question_len}) > limit ({LIMITS['POLL_QUESTION']}). Original length: {telegram_len(question)}.")
+        if len(options) > LIMITS["POLL_MAX_OPTIONS"]: errors.append(f"{label}: Option count ({len(options)}) > limit ({LIMITS['POLL_MAX_OPTIONS']}).")
+        if len(options) < 2: errors.append(f"{label}: Poll must have at least 2 options.")
+        correct_option = item.get('correct_option')
+        if correct_option is not None and not is_option_index(correct_option, options):
+            errors.append(f"{label}: correct_option {correct_option!r} is not an option position (0-{len(options) - 1}).")
+        for o_idx, opt in enumerate(options):
+            if telegram_len(opt) > LIMITS["POLL_OPTION"]: errors.append(f"{label} Option #{o_idx+1}: Length ({telegram_len(opt)}) > limit ({LIMITS['POLL_OPTION']}).")
+        if explanation and telegram_len(explanation) > LIMITS["POLL_EXPLANATION"]: 
+            logging.warning(f"{label}: Explanation length ({telegram_len(explanation)}) > limit ({LIMITS['POLL_EXPLANATION']}). Will be auto-trimmed before sending.")
+    elif content_type == 'message':
+        text = item.get('text', '')
+        if not text: errors.append(f"{label}: Message text is empty.")
+        text_len = telegram_len(text, 'HTML')
+        if text_len > LIMITS["MESSAGE_TEXT"]: errors.append(f"{label}: Message length ({text_len}) > limit ({LIMITS['MESSAGE_TEXT']}).")
+    return errors
+
+
+# ====== COMPILED DECKS ======
+def is_compiled_deck(file_path):
+    return file_path.endswith(DECK_SUFFIX)
+
+
+def deck_header(count, prefix, sources):
+    return {
+        "format": DECK_FORMAT,
+        "version": DECK_VERSION,
+        "fields": list(DECK_FIELDS),
+        "count": count,
+        "prefix": prefix,
+        "limits": LIMITS,
+        "sources": sources,
+    }
+
+
+def to_record(item, prefix, fingerprint):
+    if item['type'] == 'message':
+        return ["message", item['text'], None, None, None, telegram_len(item['text'], 'HTML'), fingerprint]
+    return [
+        "poll", item['question'], item['options'], item.get('correct_option'), item.get('explanation'),
+        telegram_len(prefix + item['question']), fingerprint,
+    ]
+
+
+def from_record(record):
+    content_type, text, options, correct, explanation, _length, _fingerprint = record
+    if content_type == 'message':
+        return {"type": "message", "text": text}
+    item = {"type": "poll", "question": text, "options": options, "correct_option": correct}
+    if explanation:
+        item["explanation"] = explanation
+    return item
+
+
+def read_deck_header(file_path):
+    with open(file_path, 'r', encoding='utf-8') as f:
+        header = json.loads(f.readline())
+    if header.get("format") != DECK_FORMAT or header.get("version") != DECK_VERSION:
+        raise ValueError(f"{file_path} is not a version {DECK_VERSION} compiled deck.")
+    if tuple(header.get("fields", ())) != DECK_FIELDS:
+        raise ValueError(f"{file_path} uses an unknown record layout: {header.get('fields')}.")
+    return header
+
+
+def deck_is_current(header, prefix=QUESTION_PREFIX):
+    """A compiled deck can skip validation only if it was checked against today's prefix and limits."""
+    return header.get("prefix") == prefix and header.get("limits") == LIMITS
+
+
+def iter_deck(file_path):
+    """Yields (item, fingerprint) for every record of a compiled deck, one line at a time."""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        f.readline()
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                yield from_record(record), record[DECK_FIELDS.index("fingerprint")]
+
+
+def write_deck(items_with_fingerprints, out_path, prefix, sources):
+    """Writes (item, fingerprint) pairs as a compiled deck; the header is written last via a temp file."""
+    directory = os.path.dirname(os.path.abspath(out_path))
+    tmp_body = out_path + ".body.tmp"
+    count = 0
+    with open(tmp_body, 'w', encoding='utf-8') as body:
+        for item, fingerprint in items_with_fingerprints:
+            body.write(json.dumps(to_record(item, prefix, fingerprint), ensure_ascii=False, separators=(",", ":")) + "\n")
+            count += 1
+    tmp_out = os.path.join(directory, os.path.basename(out_path) + ".tmp")
+    with open(tmp_out, 'w', encoding='utf-8') as out, open(tmp_body, 'r', encoding='utf-8') as body:
+        out.write(json.dumps(deck_header(count, prefix, sources), ensure_ascii=False, separators=(",", ":")) + "\n")
+        for line in body:
+            out.write(line)
+    os.remove(tmp_body)
+    os.replace(tmp_out, out_path)
+    return count
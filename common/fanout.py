@@ -0,0 +1,38 @@
+"""
+Runs independent send lanes concurrently.
+
+A lane is everything that goes to one destination chat, in order. Telegram's
+binding limit is per chat (1 msg/s in channels, 20 msg/min in groups), so
+lanes for different chats can run side by side. Each lane awaits its own
+sends one at a time, so order within a destination is unchanged. Budgets stay
+fair because every ``acquire(chat_id)`` call is paced by that chat's own
+buckets. Only the bot-wide global bucket is shared between lanes.
+"""
+import asyncio
+import re
+
+
+def parse_chat_ids(value):
+    """Splits a CHAT_ID-style setting ("-1001, -1002" or one ID) into a list of IDs, keeping order."""
+    chat_ids = []
+    for chat_id in re.split(r"[\s,]+", value or ""):
+        if chat_id and chat_id not in chat_ids:
+            chat_ids.append(chat_id)
+    return chat_ids
+
+
+async def run_lanes(lanes):
+    """
+    Runs {name: coroutine} concurrently and returns {name: result or exception}.
+
+    One lane failing does not cancel the others; callers decide what a failed
+    lane means once every destination got as far as it could.
+    """
+    names = list(lanes)
+    results = await asyncio.gather(*(lanes[name] for name in names), return_exceptions=True)
+    return dict(zip(names, results))
+
+
+def first_error(results):
+    """The first exception among run_lanes() results, or None."""
+    return next((result for result in results.values() if isinstance(result, BaseException)), None)
@@ -0,0 +1,110 @@
+"""
+Adaptive flood control shared by send_polls and the forwarder.
+
+FloodController runs an AIMD (additive-increase, multiplicative-decrease) loop on
+the per-chat send rate: every `window` successful calls add `step` msg/s, every
+RetryAfter multiplies the rate by `backoff`. The learned rate is stored per bot
+and chat in a small JSON file so the next run starts where the last one ended.
+"""
+import json
+import logging
+import os
+import tempfile
+from datetime import datetime, timezone
+
+from common import STATE_DIR
+
+DEFAULT_STATE_FILE = os.getenv("FLOOD_STATE_FILE", os.path.join(STATE_DIR, "flood.json"))
+
+
+def bot_id_from_token(token):
+    """The numeric part of a bot token; identifies the bot without exposing the secret."""
+    return (token or "").split(":", 1)[0] or "unknown"
+
+
+class FloodController:
+    def __init__(self, bot_id, state_file=DEFAULT_STATE_FILE, initial_rate=1.0,
+                 min_rate=1 / 30, max_rate=10.0, step=0.1, window=10, backoff=0.5):
+        self.bot_id = str(bot_id)
+        self.state_file = state_file
+        self.initial_rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.step = step
+        self.window = window
+        self.backoff = backoff
+        self.rates = {}
+        self.streaks = {}
+        self.floods = 0
+        self.load()
+
+    def _key(self, chat_id):
+        return f"{self.bot_id}:{chat_id}"
+
+    def load(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logging.warning(f"Ignoring unreadable flood state {self.state_file}: {e}")
+            return
+        prefix = f"{self.bot_id}:"
+        for key, entry in state.items():
+            if key.startswith(prefix):
+                self.rates[key] = self._clamp(entry.get("rate", self.initial_rate))
+
+    def save(self):
+        """Merges this bot's learned rates into the state file (atomically)."""
+        if not self.state_file or not self.rates:
+            return
+        state = {}
+        if os.path.exists(self.state_file):
+            try:
+                with open(self.state_file, "r", encoding="utf-8") as f:
+                    state = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                state = {}
+        now = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        for key, rate in self.rates.items():
+            state[key] = {"rate": round(rate, 4), "updated": now}
+        directory = os.path.dirname(self.state_file) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.state_file)
+
+    def _clamp(self, rate):
+        return max(self.min_rate, min(self.max_rate, float(rate)))
+
+    def rate(self, chat_id):
+        return self.rates.get(self._key(chat_id), self.initial_rate)
+
+    def record_success(self, chat_id):
+        """Returns the new rate when the additive increase kicks in, otherwise None."""
+        key = self._key(chat_id)
+        self.streaks[key] = self.streaks.get(key, 0) + 1
+        if self.streaks[key] < self.window:
+            return None
+        self.streaks[key] = 0
+        new_rate = self._clamp(self.rate(chat_id) + self.step)
+        if new_rate == self.rate(chat_id):
+            return None
+        self.rates[key] = new_rate
+        return new_rate
+
+    def record_flood(self, chat_id, retry_after):
+        """Applies the multiplicative decrease and persists it right away."""
+        key = self._key(chat_id)
+        self.floods += 1
+        self.streaks[key] = 0
+        old_rate = self.rate(chat_id)
+        self.rates[key] = self._clamp(old_rate * self.backoff)
+        logging.warning(
+            f"Flood control for chat {chat_id}: RetryAfter({retry_after}s), "
+            f"rate {old_rate:.2f} -> {self.rates[key]:.2f} msg/s."
+        )
+        self.save()
+        return self.rates[key]
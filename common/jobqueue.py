@@ -0,0 +1,174 @@
+"""
+Priority job queue for the dispatcher daemon (tools/dispatcher.py), backed by a spool directory.
+
+Every job is a small JSON file in SPOOL_DIR:
+
+    {"kind": "send", "priority": 10, "args": {"file": "questions.json"}}
+
+Jobs submitted through the daemon (file watcher, control API) are written
+there too, and a job's file is only removed once the job has finished or was
+cancelled. A daemon that dies mid-job therefore picks the job up again on
+restart, and the tools' journals let it resume where it stopped. Any other
+process can queue work by dropping a file into the spool. Files that cannot be
+parsed are renamed to *.rejected.
+
+Lower priorities run first. Jobs of equal priority run in submission order.
+"""
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+from common import STATE_DIR
+
+SPOOL_DIR = os.getenv("QUIZHUB_SPOOL_DIR", os.path.join(STATE_DIR, "spool"))
+
+# Deleting wrongly posted messages is the most urgent; copying ranges can wait.
+DEFAULT_PRIORITIES = {"delete": 0, "send": 10, "forward": 20}
+# Finished jobs kept in memory for the status endpoint.
+HISTORY_SIZE = 50
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+class Job:
+    def __init__(self, job_id, kind, args=None, priority=None, source="spool", created=None):
+        if kind not in DEFAULT_PRIORITIES:
+            raise ValueError(f"Unknown job kind {kind!r}; expected one of {', '.join(DEFAULT_PRIORITIES)}.")
+        self.id = job_id
+        self.kind = kind
+        self.args = dict(args or {})
+        self.priority = DEFAULT_PRIORITIES[kind] if priority is None else int(priority)
+        self.source = source
+        self.created = created or _now()
+        self.state = "queued"
+        self.started = None
+        self.finished = None
+        self.error = None
+        self.result = None
+        self.cancel_requested = False
+
+    def to_dict(self):
+        return {
+            "id": self.id, "kind": self.kind, "priority": self.priority, "args": self.args,
+            "source": self.source, "state": self.state, "created": self.created,
+            "started": self.started, "finished": self.finished, "error": self.error, "result": self.result,
+        }
+
+
+class JobQueue:
+    def __init__(self, directory=SPOOL_DIR, history=HISTORY_SIZE):
+        self.directory = directory
+        self.jobs = {}
+        self.recent = deque(maxlen=history)
+        self._heap = []
+        self._order = itertools.count()
+        self._changed = asyncio.Event()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, job_id):
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def _add(self, job):
+        self.jobs[job.id] = job
+        heapq.heappush(self._heap, (job.priority, next(self._order), job.id))
+        self._changed.set()
+        logging.info(f"Queued {job.kind} job {job.id} (priority {job.priority}, from {job.source}).")
+
+    def submit(self, kind, args=None, priority=None, source="api"):
+        """Writes a new job to the spool and queues it."""
+        job = Job(f"{time.time_ns()}-{kind}", kind, args, priority, source)
+        entry = {"kind": job.kind, "priority": job.priority, "args": job.args,
+                 "source": job.source, "created": job.created}
+        temp_path = self._path(job.id) + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        # Renamed into place only when complete, so a concurrent scan never reads half a file.
+        os.replace(temp_path, self._path(job.id))
+        self._add(job)
+        return job
+
+    def scan(self):
+        """Queues spool files that are not known yet; returns how many were added."""
+        added = 0
+        for name in sorted(os.listdir(self.directory)):
+            job_id, extension = os.path.splitext(name)
+            if extension != ".json" or job_id in self.jobs:
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+                job = Job(job_id, entry["kind"], entry.get("args"), entry.get("priority"),
+                          entry.get("source", "spool"), entry.get("created"))
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logging.error(f"Rejecting spool file {name}: {e}")
+                os.replace(path, path[:-len(extension)] + ".rejected")
+                continue
+            self._add(job)
+            added += 1
+        return added
+
+    def find_queued(self, kind, args):
+        """A job of this kind and with these arguments that has not started yet, if any."""
+        return next((job for job in self.jobs.values()
+                     if job.state == "queued" and job.kind == kind and job.args == args), None)
+
+    async def next(self):
+        """Waits for the highest-priority queued job, marks it running and returns it."""
+        while True:
+            while self._heap:
+                _, _, job_id = heapq.heappop(self._heap)
+                job = self.jobs.get(job_id)
+                if job and job.state == "queued":
+                    job.state = "running"
+                    job.started = _now()
+                    return job
+            self._changed.clear()
+            await self._changed.wait()
+
+    def cancel(self, job_id):
+        """
+        Cancels a queued job outright. A running job is only flagged with
+        cancel_requested here; whoever runs it has to stop it. Returns the job or None.
+        """
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        if job.state == "queued":
+            self.finish(job, "cancelled")
+        elif job.state == "running":
+            job.cancel_requested = True
+        return job
+
+    def finish(self, job, state, error=None, result=None):
+        """Records the outcome and removes the job from the spool."""
+        job.state = state
+        job.finished = _now()
+        job.error = error
+        job.result = result
+        self.jobs.pop(job.id, None)
+        self.recent.appendleft(job)
+        try:
+            os.remove(self._path(job.id))
+        except FileNotFoundError:
+            pass
+        logging.info(f"Job {job.id} {state}{f': {error}' if error else ''}.")
+
+    def get(self, job_id):
+        return self.jobs.get(job_id) or next((job for job in self.recent if job.id == job_id), None)
+
+    def snapshot(self):
+        active = sorted(self.jobs.values(), key=lambda job: (job.state != "running", job.priority, job.id))
+        return {
+            "running": [job.to_dict() for job in active if job.state == "running"],
+            "queued": [job.to_dict() for job in active if job.state == "queued"],
+            "recent": [job.to_dict() for job in self.recent],
+        }
@@ -0,0 +1,121 @@
+"""
+Durable checkpoint journal for resumable sends.
+
+A journal is an append-only JSON-lines file named after the tool, the destination
+chat and the SHA-256 of the source file, so editing the source starts a fresh
+journal while re-running an unchanged one resumes it. Every confirmed item is
+appended and fsync'd before the next send, so a crash loses at most the item
+that was in flight. A torn final line from a crash is ignored on load and cut
+off before the next append, so new entries never run into it.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+from datetime import datetime, timezone
+
+from common import STATE_DIR
+
+JOURNAL_DIR = os.path.join(STATE_DIR, "journal")
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def open_append(path):
+    """
+    Opens a JSON-lines file for appending. A last line without its newline is
+    a crash's leftover. If it still parses, it only lacks the newline and gets
+    one. Otherwise it is cut off. Either way the next entry starts on its own line.
+    """
+    with open(path, "ab+") as f:
+        end = f.seek(0, os.SEEK_END)
+        start = end
+        while start > 0:
+            block = min(start, 1 << 16)
+            f.seek(start - block)
+            chunk = f.read(block)
+            if start == end and chunk.endswith(b"\n"):
+                break
+            newline = chunk.rfind(b"\n")
+            if newline >= 0:
+                start -= block - newline - 1
+                break
+            start -= block
+        if start < end:
+            f.seek(start)
+            try:
+                json.loads(f.read(end - start))
+            except ValueError:
+                f.truncate(start)
+            else:
+                f.write(b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+    return open(path, "a", encoding="utf-8")
+
+
+class Journal:
+    def __init__(self, tool, chat_id, source_hash, directory=JOURNAL_DIR):
+        safe_chat = re.sub(r"[^A-Za-z0-9_-]", "_", str(chat_id))
+        self.directory = directory
+        self.path = os.path.join(directory, f"{tool}-{safe_chat}-{source_hash[:16]}.jsonl")
+        self.done = {}
+        # Opened on the first record, so a run that records nothing leaves no empty file behind.
+        self._file = None
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    logging.warning(f"Ignoring torn journal line {line_no} in {self.path}.")
+                    continue
+                for key in entry.pop("keys"):
+                    self.done[key] = entry
+
+    def __contains__(self, key):
+        return str(key) in self.done
+
+    def __len__(self):
+        return len(self.done)
+
+    def record(self, key, **fields):
+        self.record_many([key], **fields)
+
+    def record_many(self, keys, **fields):
+        """Appends one durable entry covering every key in `keys`."""
+        keys = [str(key) for key in keys]
+        entry = {"keys": keys, "at": datetime.now(timezone.utc).isoformat(timespec="seconds"), **fields}
+        if self._file is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._file = open_append(self.path)
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        for key in keys:
+            self.done[key] = fields
+
+    def discard(self):
+        """Forgets all progress and removes the file, e.g. after a complete run or for a fresh full send."""
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        self.done = {}
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
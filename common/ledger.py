@@ -0,0 +1,160 @@
+"""
+Content-addressed ledger of what has been posted to a chat.
+
+Each deck item is fingerprinted from its normalized content (question, options,
+answer and explanation, or message text) and mapped to the Telegram message ID it
+was posted as. Lookups are a dict hit, so diffing a deck against a ledger with
+tens of thousands of entries stays O(1) per item. Entries also name the deck
+they were posted from, because one chat's ledger covers every deck ever sent to
+it and pruning must only touch the posts of the deck being sent. The ledger is
+an append-only JSON-lines file; removals are tombstones and the file is
+compacted on close once dead lines outnumber live entries.
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+import unicodedata
+from collections import Counter
+from datetime import datetime, timezone
+
+from common import REPO_ROOT, STATE_DIR
+from common.journal import open_append
+
+LEDGER_DIR = os.path.join(STATE_DIR, "ledger")
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFC", str(text or ""))).strip()
+
+
+def item_fingerprint(item):
+    content_type = item.get('type', 'poll')
+    if content_type == 'message':
+        parts = [content_type, normalize_text(item.get('text'))]
+    else:
+        parts = [
+            content_type,
+            normalize_text(item.get('question')),
+            *(normalize_text(option) for option in item.get('options', [])),
+            str(item.get('correct_option')),
+            normalize_text(item.get('explanation')),
+        ]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()[:32]
+
+
+class LedgerKeyer:
+    """
+    Assigns ledger keys to items as they stream past: the fingerprint plus an
+    occurrence counter, so a deck that intentionally repeats an item still maps
+    every copy to its own message.
+    """
+
+    def __init__(self):
+        self.seen = Counter()
+
+    def __call__(self, item, fingerprint=None):
+        """`fingerprint` may be passed in when it was precomputed (compiled decks)."""
+        fingerprint = fingerprint or item_fingerprint(item)
+        key = f"{fingerprint}:{self.seen[fingerprint]}"
+        self.seen[fingerprint] += 1
+        return key
+
+
+def deck_name(path):
+    """How ledger entries name a deck: its repository-relative path, or the absolute one outside the repo."""
+    path = os.path.abspath(path)
+    if path.startswith(REPO_ROOT + os.sep):
+        return os.path.relpath(path, REPO_ROOT).replace(os.sep, "/")
+    return path
+
+
+def ledger_path(chat_id):
+    safe_chat = re.sub(r"[^A-Za-z0-9_-]", "_", str(chat_id))
+    return os.path.join(LEDGER_DIR, f"{safe_chat}.jsonl")
+
+
+class SentLedger:
+    def __init__(self, chat_id, path=None):
+        self.path = path or ledger_path(chat_id)
+        self.entries = {}
+        self.dead_lines = 0
+        self._load()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._file = open_append(self.path)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    self.dead_lines += 1
+                    continue
+                key = entry.pop("key")
+                if entry.get("deleted"):
+                    self.dead_lines += 1 + (key in self.entries)
+                    self.entries.pop(key, None)
+                else:
+                    self.dead_lines += key in self.entries
+                    self.entries[key] = entry
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def keys(self):
+        return self.entries.keys()
+
+    def message_id(self, key):
+        return self.entries[key].get("message_id")
+
+    def deck(self, key):
+        """The deck the entry was posted from; None for entries written before decks were recorded."""
+        return self.entries[key].get("deck")
+
+    def keys_of_deck(self, deck):
+        return {key for key, entry in self.entries.items() if entry.get("deck") == deck}
+
+    def _append(self, entry):
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def record(self, key, message_id, deck=None):
+        entry = {"message_id": message_id, "at": datetime.now(timezone.utc).isoformat(timespec="seconds")}
+        if deck is not None:
+            entry["deck"] = deck
+        self.dead_lines += key in self.entries
+        self._append({"key": key, **entry})
+        self.entries[key] = entry
+
+    def forget(self, key):
+        if key not in self.entries:
+            return
+        self._append({"key": key, "deleted": True})
+        del self.entries[key]
+        self.dead_lines += 2
+
+    def close(self):
+        self._file.close()
+        if self.dead_lines > len(self.entries):
+            self._compact()
+
+    def _compact(self):
+        directory = os.path.dirname(self.path) or "."
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            for key, entry in self.entries.items():
+                f.write(json.dumps({"key": key, **entry}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.dead_lines = 0
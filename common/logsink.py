@@ -0,0 +1,155 @@
+"""
+Background sink for log-channel messages.
+
+post() only appends to a bounded in-memory queue and returns immediately, so a
+slow or throttled log channel can never stall the send path. A background task
+debounces entries for a few seconds, packs as many as fit into one digest post
+of at most `max_chars`, and sends digests under its own small rate budget.
+Entries are HTML and measured the way Telegram does (see common.textlimits).
+When the queue is full, low-priority entries are dropped (and counted) first.
+High-priority entries evict low-priority ones; once the queue holds nothing
+else, further ones are counted too and reported as a "+N more errors" line.
+A digest Telegram rejects for any reason other than flood control is resent
+once as plain text, so one malformed entry cannot take the rest down with it.
+close() flushes whatever is left.
+"""
+import asyncio
+import collections
+import html
+import logging
+import time
+
+from common.ratelimit import TokenBucket
+from common.textlimits import strip_entities, telegram_len, truncate
+
+LOW = 0
+HIGH = 1
+
+DIGEST_SEPARATOR = "\n\n"
+
+
+class LogSink:
+    def __init__(self, send, max_queue=200, debounce_seconds=3.0, max_chars=4096,
+                 rate=1 / 3, burst=3, clock=time.monotonic, sleep=asyncio.sleep):
+        """
+        `send(text, parse_mode)` is a coroutine function that posts one text to
+        the log channel; parse_mode is "HTML", or None for plain text.
+        """
+        self.send = send
+        self.max_queue = max_queue
+        self.debounce_seconds = debounce_seconds
+        self.max_chars = max_chars
+        self.budget = TokenBucket(rate, burst, clock)
+        self.sleep = sleep
+        self.entries = collections.deque()
+        self.dropped = 0
+        self.dropped_high = 0
+        self.closing = False
+        self.task = None
+        self.wakeup = asyncio.Event()
+        self.flush_now = asyncio.Event()
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+        return self
+
+    def post(self, text, priority=LOW):
+        text = self._fit(text)
+        if len(self.entries) >= self.max_queue:
+            if priority == LOW:
+                self.dropped += 1
+                return
+            # Make room for an important entry by evicting the oldest unimportant one.
+            for index, (entry_priority, _) in enumerate(self.entries):
+                if entry_priority == LOW:
+                    del self.entries[index]
+                    self.dropped += 1
+                    break
+            else:
+                self.dropped_high += 1
+                self.flush_now.set()
+                return
+        self.entries.append((priority, text))
+        self.wakeup.set()
+        if priority == HIGH:
+            self.flush_now.set()
+
+    def _fit(self, text):
+        """
+        An entry too long for one post loses its markup and is trimmed as plain
+        text; cutting the HTML itself could split a tag and get the digest rejected.
+        """
+        if telegram_len(text, "HTML") <= self.max_chars:
+            return text
+        return html.escape(truncate(strip_entities(text, "HTML"), self.max_chars), quote=False)
+
+    def _take_digest(self):
+        parts, size = [], 0
+        if self.dropped_high:
+            parts.append(f"(+{self.dropped_high} more errors not shown; see the run log)")
+            self.dropped_high = 0
+        if self.dropped:
+            parts.append(f"({self.dropped} low-priority log entries dropped)")
+            self.dropped = 0
+        if parts:
+            size = telegram_len(DIGEST_SEPARATOR.join(parts))
+        while self.entries:
+            text = self.entries[0][1]
+            extra = telegram_len(text, "HTML") + (telegram_len(DIGEST_SEPARATOR) if parts else 0)
+            if parts and size + extra > self.max_chars:
+                break
+            self.entries.popleft()
+            parts.append(text)
+            size += extra
+        return DIGEST_SEPARATOR.join(parts)
+
+    async def _run(self):
+        while True:
+            if not self.entries:
+                if self.closing:
+                    return
+                await self.wakeup.wait()
+                self.wakeup.clear()
+                continue
+            if not self.closing and not self.flush_now.is_set():
+                # Debounce: give related entries a moment to arrive so they share one post.
+                try:
+                    await asyncio.wait_for(self.flush_now.wait(), self.debounce_seconds)
+                except asyncio.TimeoutError:
+                    pass
+            self.flush_now.clear()
+            wait = self.budget.delay()
+            if wait > 0:
+                await self.sleep(wait)
+            self.budget.consume()
+            await self._deliver(self._take_digest())
+
+    async def _deliver(self, digest):
+        for attempt in range(1, 4):
+            try:
+                await self.send(digest, "HTML")
+                return
+            except Exception as e:
+                retry_after = getattr(e, "retry_after", None)
+                if retry_after and attempt < 3:
+                    await self.sleep(float(retry_after) + 1)
+                    continue
+                if retry_after:
+                    logging.error(f"Failed to send log digest to Telegram log channel: {e}")
+                    return
+                logging.warning(f"Log digest rejected as HTML ({e}); resending it as plain text.")
+                break
+        try:
+            await self.send(strip_entities(digest, "HTML"), None)
+        except Exception as e:
+            logging.error(f"Failed to send log digest to Telegram log channel: {e}")
+
+    async def close(self):
+        """Flushes every queued entry, then stops the background task."""
+        if self.task is None:
+            return
+        self.closing = True
+        self.flush_now.set()
+        self.wakeup.set()
+        await self.task
+        self.task = None
@@ -0,0 +1,209 @@
+"""
+Run metrics for the send paths, written as OpenMetrics text and JSON.
+
+Each tool keeps one Metrics instance and records:
+
+    api_calls_total{method,outcome}      every Bot API call: ok, retry_after or error
+    api_call_seconds{method}             latency histogram per method
+    sleep_seconds_total{reason}          time spent waiting: rate_limit, network_retry, ...
+    retry_after_total / retry_after_seconds_total
+    item_attempts                        histogram of calls needed per item (1 = no retries)
+
+``write()`` puts <tool>.prom and <tool>.json into METRICS_DIR, which the
+workflows upload as an artifact. With QUIZHUB_TRACE=1 every call is also
+appended to <tool>.trace.jsonl as a span (start offset, duration, outcome), so
+a slow run can be replayed call by call.
+"""
+import asyncio
+import contextlib
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+from common import REPO_ROOT
+
+METRICS_DIR = os.getenv("QUIZHUB_METRICS_DIR", os.path.join(REPO_ROOT, "metrics"))
+TRACE_ENABLED = os.getenv("QUIZHUB_TRACE", "0").lower() in ("1", "true", "yes")
+PREFIX = "quizhub_"
+
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+ATTEMPT_BUCKETS = (1, 2, 3, 4, 5, 10)
+
+
+def retry_after_seconds(error):
+    """The flood wait carried by a PTB RetryAfter or aiogram TelegramRetryAfter, else None."""
+    retry_after = getattr(error, "retry_after", None)
+    if retry_after is None:
+        return None
+    return retry_after.total_seconds() if hasattr(retry_after, "total_seconds") else float(retry_after)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def cumulative(self):
+        """(le, count) pairs as OpenMetrics expects them, ending with +Inf."""
+        return [*zip((str(bound) for bound in self.buckets), self.counts), ("+Inf", self.count)]
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+class Metrics:
+    def __init__(self, tool, directory=METRICS_DIR, trace=TRACE_ENABLED, clock=time.monotonic):
+        self.tool = tool
+        self.directory = directory
+        self.clock = clock
+        self.started = clock()
+        self.started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        self.counters = {}
+        self.histograms = {}
+        self._trace_path = os.path.join(directory, f"{tool}.trace.jsonl") if trace else None
+        self._trace_file = None
+
+    def reset(self):
+        """Starts a new run on the same instance, e.g. for each job of tools/dispatcher.py."""
+        self.started = self.clock()
+        self.started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram(buckets)
+        histogram.observe(value)
+
+    @contextlib.contextmanager
+    def call(self, method, **span):
+        """
+        Times one Bot API call. The outcome comes from the exception, if any: a
+        flood wait counts as retry_after (and adds to the RetryAfter totals),
+        anything else as error. Extra keyword arguments only go into the trace.
+        """
+        start = self.clock()
+        outcome = "ok"
+        try:
+            yield
+        except Exception as e:
+            wait = retry_after_seconds(e)
+            if wait is not None:
+                outcome = "retry_after"
+                self.inc("retry_after")
+                self.inc("retry_after_seconds", wait)
+            else:
+                outcome = "error"
+            raise
+        finally:
+            elapsed = self.clock() - start
+            self.inc("api_calls", method=method, outcome=outcome)
+            self.observe("api_call_seconds", elapsed, method=method)
+            if self._trace_path:
+                self._trace({"t": round(start - self.started, 4), "method": method,
+                             "seconds": round(elapsed, 4), "outcome": outcome, **span})
+
+    def record_attempts(self, attempts):
+        """How many calls one item (or batch) needed until it succeeded or was given up."""
+        self.observe("item_attempts", attempts, buckets=ATTEMPT_BUCKETS)
+
+    def sleeper(self, reason, sleep=asyncio.sleep):
+        """Wraps an async sleep so the time actually spent in it is counted under `reason`."""
+        async def timed_sleep(seconds):
+            start = self.clock()
+            try:
+                await sleep(seconds)
+            finally:
+                self.inc("sleep_seconds", self.clock() - start, reason=reason)
+        return timed_sleep
+
+    def _trace(self, span):
+        if self._trace_file is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._trace_file = open(self._trace_path, "w", encoding="utf-8")
+        self._trace_file.write(json.dumps(span, separators=(",", ":")) + "\n")
+
+    def _total(self, name, **match):
+        return sum(value for (key, labels), value in self.counters.items()
+                   if key == name and all(dict(labels).get(k) == v for k, v in match.items()))
+
+    def summary(self):
+        """The headline numbers: where the wall time went and how often Telegram pushed back."""
+        api_seconds = sum(h.sum for (name, _), h in self.histograms.items() if name == "api_call_seconds")
+        sleep_by_reason = {dict(labels)["reason"]: round(value, 3)
+                           for (name, labels), value in self.counters.items() if name == "sleep_seconds"}
+        return {
+            "run_seconds": round(self.clock() - self.started, 3),
+            "api_seconds": round(api_seconds, 3),
+            "sleep_seconds": sleep_by_reason,
+            "api_calls": self._total("api_calls"),
+            "api_errors": self._total("api_calls", outcome="error"),
+            "retry_after": self._total("retry_after"),
+            "retry_after_seconds": round(self._total("retry_after_seconds"), 3),
+        }
+
+    def to_openmetrics(self):
+        lines = []
+        labels_tool = (("tool", self.tool),)
+        for name in sorted({name for name, _ in self.counters}):
+            lines.append(f"# TYPE {PREFIX}{name} counter")
+            for (key, labels), value in sorted(self.counters.items()):
+                if key == name:
+                    lines.append(f"{PREFIX}{name}_total{_label_text(labels_tool + labels)} {value:g}")
+        for name in sorted({name for name, _ in self.histograms}):
+            lines.append(f"# TYPE {PREFIX}{name} histogram")
+            for (key, labels), histogram in sorted(self.histograms.items(), key=lambda entry: entry[0]):
+                if key != name:
+                    continue
+                for le, count in histogram.cumulative():
+                    lines.append(f"{PREFIX}{name}_bucket{_label_text(labels_tool + labels + (('le', le),))} {count}")
+                lines.append(f"{PREFIX}{name}_sum{_label_text(labels_tool + labels)} {histogram.sum:g}")
+                lines.append(f"{PREFIX}{name}_count{_label_text(labels_tool + labels)} {histogram.count}")
+        lines.append(f"# TYPE {PREFIX}run_seconds gauge")
+        lines.append(f"{PREFIX}run_seconds{_label_text(labels_tool)} {self.clock() - self.started:.3f}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def to_json(self):
+        return {
+            "tool": self.tool,
+            "started": self.started_at,
+            "summary": self.summary(),
+            "counters": [{"name": name, "labels": dict(labels), "value": value}
+                         for (name, labels), value in sorted(self.counters.items())],
+            "histograms": [{"name": name, "labels": dict(labels), "buckets": dict(h.cumulative()),
+                            "sum": round(h.sum, 6), "count": h.count}
+                           for (name, labels), h in sorted(self.histograms.items(), key=lambda entry: entry[0])],
+        }
+
+    def write(self):
+        """Writes <tool>.prom and <tool>.json and returns the JSON path."""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, f"{self.tool}.prom"), "w", encoding="utf-8") as f:
+            f.write(self.to_openmetrics())
+        json_path = os.path.join(self.directory, f"{self.tool}.json")
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_json(), f, indent=2)
+        if self._trace_file is not None:
+            self._trace_file.close()
+            self._trace_file = None
+        return json_path
@@ -0,0 +1,184 @@
+"""
+Dry-run planning: how long will a send take, without sending anything.
+
+The real limiters and bot pool are driven by a virtual clock. Their ``sleep``
+returns a marker instead of waiting, and ``simulate`` runs a tiny discrete-event
+loop over the lanes: it always resumes the lane that wakes up first and jumps
+the clock straight to that moment. Every pacing rule therefore applies exactly
+as in a real run: token buckets, batch pauses, per-chat budgets, the bot pool
+and concurrent lanes. Once the schedule settles into a repeating pattern, the
+remaining calls are extrapolated, so even 100k items plan in milliseconds.
+
+Assumptions: every call succeeds after `call_seconds`, and adaptive limiters
+keep the rates they have learned so far, because no RetryAfter ever arrives.
+"""
+import heapq
+import itertools
+from collections import Counter
+
+# Rough round-trip time of one Bot API call from a GitHub-hosted runner.
+DEFAULT_CALL_SECONDS = 0.1
+# GitHub Actions cancels a job after 6 hours.
+ACTIONS_JOB_LIMIT_SECONDS = 6 * 3600
+# Windows the peak rate is reported for, in seconds.
+PEAK_WINDOWS = (1.0, 60.0)
+# Steady-state detection (see steady_period): how often to look, how long a
+# schedule must have repeated and the longest repeating pattern recognised.
+CHECK_EVERY = 128
+STEADY_CALLS = 1000
+MAX_PERIOD = 64
+
+
+class _Wake:
+    """What a simulated coroutine yields: resume me at `at`."""
+    __slots__ = ("at",)
+
+    def __init__(self, at):
+        self.at = at
+
+    def __await__(self):
+        yield self
+
+
+class VirtualClock:
+    """A clock and an async sleep for limiters (``clock=``/``sleep=``) that never really wait."""
+
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        return _Wake(self.now + max(0.0, seconds))
+
+
+class MeanRandom:
+    """Stands in for `random` so randomised pauses take their mean and the schedule stays periodic."""
+
+    @staticmethod
+    def uniform(a, b):
+        return (a + b) / 2
+
+
+class Plan:
+    def __init__(self, wall_seconds, call_times, methods, lanes, call_seconds):
+        self.wall_seconds = wall_seconds
+        self.calls = sum(methods.values())
+        self.methods = methods
+        self.lanes = lanes
+        self.call_seconds = call_seconds
+        self.peak_per_second, self.peak_per_minute = (peak_in_window(call_times, window) for window in PEAK_WINDOWS)
+
+    def report(self):
+        """Human-readable summary lines."""
+        lines = [
+            f"Estimated wall time: {format_duration(self.wall_seconds)} "
+            f"({self.calls} API calls over {self.lanes} lane{'s' if self.lanes != 1 else ''}, "
+            f"assuming {self.call_seconds * 1000:.0f} ms per call and no flood waits).",
+            "Calls by method: " + ", ".join(f"{method} {count}" for method, count in sorted(self.methods.items())),
+            f"Peak rate: {self.peak_per_second} call{'s' if self.peak_per_second != 1 else ''} in any 1 s, "
+            f"{self.peak_per_minute} in any 60 s.",
+        ]
+        if self.wall_seconds > ACTIONS_JOB_LIMIT_SECONDS:
+            lines.append("⚠️ This exceeds GitHub Actions' 6 h job limit; the run will need to resume from its checkpoint.")
+        return lines
+
+
+def format_duration(seconds):
+    minutes, secs = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h {minutes:02d}m {secs:02d}s" if hours else f"{minutes}m {secs:02d}s"
+
+
+def peak_in_window(times, window):
+    """Largest number of (sorted) call start times inside any `window` seconds."""
+    peak = 0
+    first = 0
+    for last, at in enumerate(times):
+        while at - times[first] >= window:
+            first += 1
+        peak = max(peak, last - first + 1)
+    return peak
+
+
+def steady_period(times, min_calls=STEADY_CALLS, max_period=MAX_PERIOD, tolerance=1e-6):
+    """
+    The period p of the call-start gaps at the end of `times` when the last
+    max(3p, min_calls) gaps repeat every p calls, else None. The long window
+    keeps limiter warm-up, such as a group's 20-message burst, from being taken
+    for the steady state.
+    """
+    tail = times[-(min_calls + 4 * max_period + 1):]
+    gaps = [b - a for a, b in zip(tail, tail[1:])]
+    n = len(gaps)
+    for period in range(1, max_period + 1):
+        span = max(3 * period, min_calls)
+        if span + period > n:
+            return None
+        if all(abs(gaps[i] - gaps[i - period]) <= tolerance for i in range(n - span, n)):
+            return period
+    return None
+
+
+def simulate(lanes, acquire, clock, call_seconds=DEFAULT_CALL_SECONDS):
+    """
+    Plays `lanes` ({chat_id: list of method names}) against `acquire(chat_id)`,
+    a limiter's or pool's acquire built on `clock`, and returns a Plan.
+    Lanes run concurrently, and each sends its calls in order.
+
+    Once a single lane is left and its schedule has become periodic, the rest
+    is extrapolated from one period instead of being played call by call.
+    """
+    call_times = []
+    methods = Counter()
+    queue = []
+
+    async def run_lane(chat_id, lane_methods):
+        for index, method in enumerate(lane_methods):
+            await acquire(chat_id)
+            call_times.append(clock.now)
+            methods[method] += 1
+            if not queue and len(call_times) % CHECK_EVERY == 0:
+                period = steady_period(call_times)
+                if period:
+                    extrapolate(lane_methods[index + 1:], period)
+                    return
+            await clock.sleep(call_seconds)
+
+    def extrapolate(remaining, period):
+        methods.update(remaining)
+        pattern = [b - a for a, b in zip(call_times[-period - 1:-1], call_times[-period:])]
+        cycles, rest = divmod(len(remaining), period)
+        last = call_times[-1] + cycles * sum(pattern) + sum(pattern[:rest])
+        # Enough synthetic calls to cover the widest peak window; later ones only repeat it.
+        start = at = call_times[-1]
+        for i in range(len(remaining)):
+            at += pattern[i % period]
+            call_times.append(at)
+            if at - start > 2 * PEAK_WINDOWS[-1] and i % period == period - 1:
+                break
+        clock.now = last + call_seconds
+
+    order = itertools.count()
+    for chat_id, lane_methods in lanes.items():
+        queue.append((clock.now, next(order), run_lane(chat_id, list(lane_methods))))
+    heapq.heapify(queue)
+    while queue:
+        at, _, lane = heapq.heappop(queue)
+        clock.now = max(clock.now, at)
+        # Keep resuming the same lane while nothing else is due earlier.
+        while True:
+            try:
+                wake = lane.send(None)
+            except StopIteration:
+                break
+            if not isinstance(wake, _Wake):
+                lane.close()
+                raise RuntimeError("A simulated limiter awaited something other than the virtual clock's sleep().")
+            if queue and queue[0][0] < wake.at:
+                heapq.heappush(queue, (wake.at, next(order), lane))
+                break
+            clock.now = max(clock.now, wake.at)
+
+    return Plan(clock.now, call_times, methods, len(lanes), call_seconds)
@@ -0,0 +1,247 @@
+"""
+Pluggable rate limiting for Telegram Bot API calls.
+
+Every limiter exposes one coroutine, ``acquire(chat_id)``, which waits until one
+more request to ``chat_id`` fits the budget and then returns. Callers await it
+right before each API call instead of sleeping a fixed amount afterwards, and
+report the outcome with ``on_success(chat_id)`` / ``on_retry_after(chat_id, seconds)``
+so the limiter can honour flood waits and, when adaptive, tune its rate.
+``delay(chat_id)`` peeks at how long ``acquire`` would wait without taking a
+token; common.botpool uses it to pick the bot that can send soonest.
+
+The "unlimited" preset ignores every limit and exists only for benchmarks: it is
+available only with QUIZHUB_BENCHMARK=1 and a TELEGRAM_API_URL other than the
+real Bot API (tools/benchmark.py sets both).
+"""
+import asyncio
+import os
+import random
+import time
+from collections import deque
+
+from common import OFFICIAL_API_URL, TELEGRAM_API_URL
+from common.flood import FloodController
+
+# Telegram's published bot limits:
+# https://core.telegram.org/bots/faq#my-bot-is-hitting-limits-how-do-i-avoid-this
+GLOBAL_MESSAGES_PER_SECOND = 30
+CHAT_MESSAGES_PER_SECOND = 1
+GROUP_MESSAGES_PER_MINUTE = 20
+
+# Refill arithmetic is floating point; treat a bucket this close to a full token as ready
+# so a waiter never spins on a deficit smaller than the clock can represent.
+_EPSILON = 1e-9
+
+
+class TokenBucket:
+    """Classic token bucket: refills at `rate` tokens/s up to `capacity`."""
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def set_rate(self, rate):
+        """Changes the refill rate, crediting tokens earned at the old rate first."""
+        self._refill()
+        self.rate = float(rate)
+
+    def delay(self, tokens=1):
+        """Returns how many seconds until `tokens` are available (0 if available now)."""
+        self._refill()
+        if self.tokens >= tokens - _EPSILON:
+            return 0.0
+        return (tokens - self.tokens) / self.rate
+
+    def consume(self, tokens=1):
+        self._refill()
+        self.tokens -= tokens
+
+
+class SlidingWindow:
+    """
+    At most `limit` requests in any `window` seconds. Unlike a token bucket,
+    which starts full and refills meanwhile, this can never let more than
+    `limit` through within one window.
+    """
+
+    def __init__(self, limit, window, clock=time.monotonic):
+        self.limit = int(limit)
+        self.window = float(window)
+        self.clock = clock
+        self.times = deque()
+
+    def delay(self, tokens=1):
+        now = self.clock()
+        while self.times and now - self.times[0] >= self.window:
+            self.times.popleft()
+        if len(self.times) + tokens <= self.limit:
+            return 0.0
+        return self.times[len(self.times) + tokens - self.limit - 1] + self.window - now
+
+    def consume(self, tokens=1):
+        self.times.extend([self.clock()] * tokens)
+
+
+class RateLimiter:
+    """
+    Token-bucket limiter with one global budget plus per-chat budgets.
+
+    `chat_limits` is a sequence of (rate, capacity) pairs; every chat gets its own
+    bucket for each pair and a request must fit all of them. `chat_windows` adds
+    (limit, seconds) sliding windows per chat the same way, so a group can be
+    held to both 1 msg/s and 20 msg/min at once.
+
+    With a `controller` (see common.flood) the rate of the first per-chat bucket
+    is learned instead of fixed.
+    """
+
+    def __init__(self, global_rate=GLOBAL_MESSAGES_PER_SECOND,
+                 chat_limits=((CHAT_MESSAGES_PER_SECOND, 1),), chat_windows=(),
+                 controller=None, clock=time.monotonic, sleep=asyncio.sleep):
+        self.clock = clock
+        self.sleep = sleep
+        self.chat_limits = tuple(chat_limits)
+        self.chat_windows = tuple(chat_windows)
+        self.controller = controller
+        self.global_bucket = TokenBucket(global_rate, global_rate, clock)
+        self.chat_buckets = {}
+        self.blocked_until = {}
+
+    def buckets_for(self, chat_id):
+        buckets = self.chat_buckets.get(chat_id)
+        if buckets is None:
+            buckets = [TokenBucket(rate, capacity, self.clock) for rate, capacity in self.chat_limits]
+            buckets += [SlidingWindow(limit, window, self.clock) for limit, window in self.chat_windows]
+            if self.controller:
+                buckets[0].set_rate(self.controller.rate(chat_id))
+            self.chat_buckets[chat_id] = buckets
+        return buckets
+
+    def delay(self, chat_id):
+        """Seconds until a request to `chat_id` would fit, without taking a token."""
+        blocked = self.blocked_until.get(chat_id, 0) - self.clock()
+        return max(0.0, blocked, *(bucket.delay() for bucket in [self.global_bucket, *self.buckets_for(chat_id)]))
+
+    async def acquire(self, chat_id):
+        buckets = [self.global_bucket, *self.buckets_for(chat_id)]
+        while True:
+            # No await between measuring and consuming, so concurrent callers
+            # on the same event loop can never both take the last token.
+            wait = self.delay(chat_id)
+            if wait <= 0:
+                for bucket in buckets:
+                    bucket.consume()
+                return
+            await self.sleep(wait)
+
+    def on_success(self, chat_id):
+        if self.controller:
+            new_rate = self.controller.record_success(chat_id)
+            if new_rate is not None:
+                self.buckets_for(chat_id)[0].set_rate(new_rate)
+
+    def on_retry_after(self, chat_id, retry_after):
+        """Blocks the chat for the flood wait (plus a second of slack) and backs off."""
+        self.blocked_until[chat_id] = self.clock() + float(retry_after) + 1
+        if self.controller:
+            self.buckets_for(chat_id)[0].set_rate(self.controller.record_flood(chat_id, retry_after))
+
+    def save(self):
+        if self.controller:
+            self.controller.save()
+
+
+class FixedDelayLimiter:
+    """
+    The original send_polls pacing: a random pause before every request and an
+    extra long pause before each new batch. Ignores the actual budget entirely.
+    """
+
+    def __init__(self, min_delay=1.0, max_delay=2.0, batch_size=19, batch_delay=20,
+                 clock=time.monotonic, sleep=asyncio.sleep, rng=random):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.clock = clock
+        self.sleep = sleep
+        self.rng = rng
+        self.sent = 0
+        self.blocked_until = 0
+
+    def delay(self, chat_id):
+        """Only flood waits are predictable; the random pause is drawn in acquire()."""
+        return max(0.0, self.blocked_until - self.clock())
+
+    async def acquire(self, chat_id):
+        delay = 0
+        if self.sent:
+            delay = self.rng.uniform(self.min_delay, self.max_delay)
+            if self.sent % self.batch_size == 0:
+                delay += self.batch_delay
+        delay = max(delay, self.blocked_until - self.clock())
+        if delay > 0:
+            await self.sleep(delay)
+        self.sent += 1
+
+    def on_success(self, chat_id):
+        pass
+
+    def on_retry_after(self, chat_id, retry_after):
+        self.blocked_until = self.clock() + float(retry_after) + 1
+
+    def save(self):
+        pass
+
+
+PRESETS = {
+    # The historical fixed sleeps: ~1.5 s per item plus 20 s every 19 items.
+    "conservative": FixedDelayLimiter,
+    # Channels and private chats: 30 msg/s overall, 1 msg/s per chat.
+    "telegram": RateLimiter,
+    # Like "telegram", but the per-chat rate is learned with AIMD and remembered per bot.
+    "adaptive": lambda bot_id="unknown", **kwargs: RateLimiter(controller=FloodController(bot_id), **kwargs),
+    # Groups additionally cap bots at 20 messages in any 60 s (a sliding window; a
+    # 20-token bucket would let 20 through at once and refill 20 more in the same minute).
+    "group": lambda **kwargs: RateLimiter(chat_windows=((GROUP_MESSAGES_PER_MINUTE, 60),), **kwargs),
+}
+BENCHMARK_PRESETS = {
+    # No pacing at all; only for local benchmarks against tools/fake_bot_api.py.
+    "unlimited": lambda **kwargs: RateLimiter(global_rate=1e9, chat_limits=(), **kwargs),
+}
+
+
+def available_presets():
+    """PRESETS, plus BENCHMARK_PRESETS when benchmarking against a stand-in Bot API."""
+    if os.getenv("QUIZHUB_BENCHMARK") == "1" and TELEGRAM_API_URL != OFFICIAL_API_URL:
+        return {**PRESETS, **BENCHMARK_PRESETS}
+    return PRESETS
+
+
+def create_limiter(preset, bot_id=None, rng=None, **kwargs):
+    """
+    Builds the limiter for a preset name; extra kwargs go to its constructor.
+    `bot_id` keys the learned rates of the "adaptive" preset and `rng` draws the
+    random pauses of the "conservative" one; both are ignored otherwise.
+    """
+    presets = available_presets()
+    try:
+        factory = presets[preset]
+    except KeyError:
+        if preset in BENCHMARK_PRESETS:
+            raise ValueError(f"Rate limit preset '{preset}' is for benchmarks only "
+                             f"(QUIZHUB_BENCHMARK=1 against a stand-in TELEGRAM_API_URL).")
+        raise ValueError(f"Unknown rate limit preset '{preset}'. Choose from: {', '.join(presets)}.")
+    if preset == "adaptive" and bot_id is not None:
+        kwargs["bot_id"] = bot_id
+    if preset == "conservative" and rng is not None:
+        kwargs["rng"] = rng
+    return factory(**kwargs)
@@ -0,0 +1,72 @@
+"""
+Length counting and trimming that match how Telegram applies its limits.
+
+Telegram measures text in UTF-16 code units after entities are parsed, so an
+astral-plane character (most emoji, some math symbols) counts twice and HTML
+markup does not count at all. Python's len() gets both wrong. Trimming backs
+off to a boundary that does not split a surrogate pair, a base letter from its
+combining marks (Bengali vowel signs, virama, ZWJ/ZWNJ) or, where possible, a word.
+"""
+import html
+import re
+import unicodedata
+
+ELLIPSIS = "…"
+
+_TAG_RE = re.compile(r"<[^>]+>")
+# How far back (as a fraction of the limit) trimming may go to end on whitespace.
+_WORD_BOUNDARY_SLACK = 0.2
+
+
+def utf16_len(text):
+    return len(text.encode("utf-16-le")) // 2
+
+
+def strip_entities(text, parse_mode=None):
+    """The text Telegram actually displays for the given parse mode."""
+    if parse_mode and parse_mode.upper() == "HTML":
+        return html.unescape(_TAG_RE.sub("", text))
+    return text
+
+
+def telegram_len(text, parse_mode=None):
+    return utf16_len(strip_entities(text or "", parse_mode))
+
+
+def _joins_previous(char):
+    return unicodedata.category(char) in ("Mn", "Mc", "Me") or char in "‌‍"
+
+
+def _safe_cut(text, cut):
+    """Moves `cut` left until text[:cut] does not end inside a grapheme cluster."""
+    while 0 < cut < len(text) and (_joins_previous(text[cut]) or text[cut - 1] in "‌‍"):
+        cut -= 1
+    return cut
+
+
+def truncate(text, limit, ellipsis=ELLIPSIS):
+    """Trims plain `text` to at most `limit` UTF-16 units, appending `ellipsis` when it had to cut."""
+    if utf16_len(text) <= limit:
+        return text
+    budget = limit - utf16_len(ellipsis)
+    cut, used = 0, 0
+    for char in text:
+        width = 2 if ord(char) > 0xFFFF else 1
+        if used + width > budget:
+            break
+        used += width
+        cut += 1
+    cut = _safe_cut(text, cut)
+    space = text.rfind(" ", 0, cut)
+    if space > 0 and cut - space <= limit * _WORD_BOUNDARY_SLACK:
+        cut = space
+    return text[:cut].rstrip() + ellipsis
+
+
+def limit_line_feeds(text, max_line_feeds):
+    """Keeps the first `max_line_feeds` line feeds and turns the rest into spaces."""
+    head, *rest = text.split("\n", max_line_feeds)
+    if len(rest) < max_line_feeds or "\n" not in rest[-1]:
+        return text
+    rest[-1] = rest[-1].replace("\n", " ")
+    return "\n".join([head, *rest])
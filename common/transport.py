@@ -0,0 +1,152 @@
+"""
+HTTP transport settings shared by send_polls, the forwarder and bulk delete.
+
+The library defaults are tuned for polling bots, not for bulk sending. PTB
+opens a single connection, and aiohttp drops idle connections after 15 s.
+Under concurrent lanes (see common.fanout) requests then queue behind the pool
+or pay for a new TLS handshake. Both clients are built here from one set of
+knobs:
+
+    TELEGRAM_POOL_SIZE        connections per bot (default 8)
+    TELEGRAM_HTTP2            "auto" (default: for https:// with the h2 package installed), "1" or "0"
+    TELEGRAM_KEEPALIVE        seconds an idle connection is kept open (default 60)
+    TELEGRAM_<KIND>_TIMEOUT   per-call-type read timeouts, see TIMEOUTS
+
+HTTP/2 applies to the httpx-based PTB clients only; aiohttp speaks HTTP/1.1.
+Every client reports into CONNECTION_STATS, so a run can log how many requests
+reused a warm connection.
+"""
+import importlib.util
+import logging
+import os
+
+from common import TELEGRAM_API_URL
+
+POOL_SIZE = int(os.getenv("TELEGRAM_POOL_SIZE", "8"))
+HTTP2 = os.getenv("TELEGRAM_HTTP2", "auto").lower()
+KEEPALIVE_SECONDS = float(os.getenv("TELEGRAM_KEEPALIVE", "60"))
+
+# Seconds, per kind of call. "send" covers single messages and polls, "batch" the
+# 100-ID copyMessages/deleteMessages calls, which Telegram answers more slowly.
+TIMEOUTS = {
+    "connect": 5.0,
+    "pool": 10.0,
+    "send": 10.0,
+    "batch": 30.0,
+}
+BATCH_METHODS = {"copy_messages", "delete_messages", "forward_messages"}
+
+
+def timeout(kind):
+    """The configured timeout for `kind`, overridable with TELEGRAM_<KIND>_TIMEOUT."""
+    return float(os.getenv(f"TELEGRAM_{kind.upper()}_TIMEOUT", TIMEOUTS[kind]))
+
+
+def call_timeout(method):
+    """Read timeout for a Bot API method given by its snake_case name."""
+    return timeout("batch" if method in BATCH_METHODS else "send")
+
+
+def use_http2(api_url=TELEGRAM_API_URL):
+    if HTTP2 in ("1", "true", "yes"):
+        return True
+    if HTTP2 in ("0", "false", "no"):
+        return False
+    # httpx only negotiates HTTP/2 through TLS; over plain http (the local fake API) it would fail.
+    return api_url.startswith("https://") and importlib.util.find_spec("h2") is not None
+
+
+class ConnectionStats:
+    """Counts requests and the connections opened for them; the rest reused a pooled connection."""
+
+    def __init__(self):
+        self.requests = 0
+        self.opened = 0
+
+    @property
+    def reused(self):
+        return max(0, self.requests - self.opened)
+
+    @property
+    def reuse_ratio(self):
+        return self.reused / self.requests if self.requests else 0.0
+
+    def summary(self):
+        connections = "connection" if self.opened == 1 else "connections"
+        return f"{self.requests} HTTP requests over {self.opened} {connections} ({self.reuse_ratio:.0%} reused)"
+
+
+CONNECTION_STATS = ConnectionStats()
+
+
+def ptb_request(stats=CONNECTION_STATS):
+    """An HTTPXRequest for python-telegram-bot with the shared pool, keep-alive and timeouts."""
+    import httpx
+    from telegram.request import HTTPXRequest
+
+    async def trace(event_name, info):
+        if event_name == "connection.connect_tcp.complete":
+            stats.opened += 1
+
+    async def on_request(request):
+        stats.requests += 1
+        request.extensions["trace"] = trace
+
+    return HTTPXRequest(
+        connection_pool_size=POOL_SIZE,
+        read_timeout=timeout("send"),
+        write_timeout=timeout("send"),
+        connect_timeout=timeout("connect"),
+        pool_timeout=timeout("pool"),
+        http_version="2" if use_http2() else "1.1",
+        httpx_kwargs={
+            "limits": httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE,
+                                   keepalive_expiry=KEEPALIVE_SECONDS),
+            "event_hooks": {"request": [on_request]},
+        },
+    )
+
+
+def aiogram_session(api_url, stats=CONNECTION_STATS):
+    """An aiogram AiohttpSession for `api_url` with the shared pool, keep-alive and timeouts."""
+    from aiohttp import ClientSession, TraceConfig
+    from aiohttp.hdrs import USER_AGENT
+    from aiohttp.http import SERVER_SOFTWARE
+    from aiogram import __version__ as aiogram_version
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+
+    async def on_request(session, context, params):
+        stats.requests += 1
+
+    async def on_connection(session, context, params):
+        stats.opened += 1
+
+    trace_config = TraceConfig()
+    trace_config.on_request_start.append(on_request)
+    trace_config.on_connection_create_end.append(on_connection)
+
+    # PooledSession relies on AiohttpSession internals; forwarder/requirements.txt pins
+    # the aiogram minor version it was written against. If they ever move, fall back to
+    # a plain session with the same pool size and timeout, just without the tracing.
+    if not all(hasattr(AiohttpSession(), name) for name in ("_connector_type", "_connector_init", "_should_reset_connector")):
+        logging.warning(f"aiogram {aiogram_version}: AiohttpSession internals changed; connection reuse is not tracked.")
+        return AiohttpSession(api=TelegramAPIServer.from_base(api_url), limit=POOL_SIZE, timeout=timeout("send"))
+
+    class PooledSession(AiohttpSession):
+        async def create_session(self):
+            if self._should_reset_connector:
+                await self.close()
+            if self._session is None or self._session.closed:
+                # Same as AiohttpSession.create_session, plus the connection tracing.
+                self._session = ClientSession(
+                    connector=self._connector_type(**self._connector_init),
+                    headers={USER_AGENT: f"{SERVER_SOFTWARE} aiogram/{aiogram_version}"},
+                    trace_configs=[trace_config],
+                )
+                self._should_reset_connector = False
+            return self._session
+
+    session = PooledSession(api=TelegramAPIServer.from_base(api_url), limit=POOL_SIZE, timeout=timeout("send"))
+    session._connector_init["keepalive_timeout"] = KEEPALIVE_SECONDS
+    return session
@@ -1,19 +1,42 @@
 import asyncio
+import contextlib
 import nest_asyncio
 import os
 import json
-import random
+import html
 import argparse
 import logging
 from telegram import Bot
 from telegram.error import BadRequest, RetryAfter, TimedOut, NetworkError
 
+from common import TELEGRAM_API_URL
+from common.botpool import BotPool, pool_tokens
+from common.dedup import NearDuplicateIndex
+from common.deck import (
+    LIMITS, POLL_EXPLANATION_MAX_LINE_FEEDS, QUESTION_PREFIX,
+    deck_is_current, is_compiled_deck, iter_deck, iter_items, read_deck_header, validate_item,
+)
+from common.fanout import first_error, parse_chat_ids, run_lanes
+from common.flood import bot_id_from_token
+from common.journal import Journal, file_sha256
+from common.ledger import LedgerKeyer, SentLedger, deck_name, ledger_path
+from common.logsink import HIGH, LOW, LogSink
+from common.metrics import Metrics
+from common.planner import MeanRandom, VirtualClock, simulate
+from common.ratelimit import available_presets, create_limiter
+from common.textlimits import limit_line_feeds, truncate
+from common.transport import CONNECTION_STATS, call_timeout, ptb_request
+
 # Allow nested asyncio
 nest_asyncio.apply()
 
 # ====== CONFIGURATION & CONSTANTS ======
 BOT_TOKEN = os.getenv("BOT_TOKEN")
+# Optional extra bots (comma-separated tokens, all admins in CHAT_ID) to share the sending load.
+BOT_TOKENS = os.getenv("BOT_TOKENS", "")
 CHAT_ID = os.getenv("CHAT_ID")
+# CHAT_ID may list several comma-separated chats; the deck is then published to all of them concurrently.
+CHAT_IDS = parse_chat_ids(CHAT_ID)
 LOG_CHANNEL_ID = os.getenv("LOG_CHANNEL_ID") 
 
 # --- EDIT YOUR SETTINGS HERE ---
@@ -21,20 +44,29 @@ LOG_CHANNEL_ID = os.getenv("LOG_CHANNEL_ID")
 BATCH_SIZE = 19
 # The pause in seconds between each batch.
 BATCH_DELAY_SECONDS = 20
+# How sending is paced: "adaptive" learns the fastest safe rate from RetryAfter responses
+# (remembered across runs), "telegram" sticks to Telegram's published limits and
+# "conservative" keeps the old fixed per-poll and per-batch pauses.
+RATE_LIMIT_PRESET = os.getenv("RATE_LIMIT_PRESET", "adaptive")
 # --- END OF SETTINGS ---
 
+# How many parsed items may wait ahead of the sender; bounds memory for huge decks.
+SEND_QUEUE_SIZE = 50
+# Telegram's maximum number of message IDs per deleteMessages call (used by --prune)
+DELETE_BATCH_SIZE = 100
+
 LOG_FILE = "bot.log"
-QUESTION_PREFIX = "[MediX]\n"
+# QUESTION_PREFIX, LIMITS and POLL_EXPLANATION_MAX_LINE_FEEDS live in common/deck.py,
+# shared with the deck compiler (tools/compile_deck.py).
+
+# Background log-channel sink for the current run (see start_log_sink).
+LOG_SINK = None
 
-LIMITS = {
-    "POLL_QUESTION": 300,
-    "POLL_OPTION": 100,
-    "POLL_EXPLANATION": 200,
-    "POLL_MAX_OPTIONS": 10,
-    "MESSAGE_TEXT": 4096
-}
+# Per-run call counts, latencies and wait times, written to metrics/send_polls.{prom,json}.
+METRICS = Metrics("send_polls")
+network_retry_sleep = METRICS.sleeper("network_retry")
 
-# Delay between each individual poll to avoid rate limits
+# Delay between each individual poll under the "conservative" preset
 MIN_DELAY_SECONDS = 1.0
 MAX_DELAY_SECONDS = 2.0
 
@@ -49,175 +81,462 @@ logging.basicConfig(
 )
 
 # ====== DATA LOADING & VALIDATION ======
-def load_items(file_path):
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            items = json.load(f)
-        logging.info(f"Successfully loaded {len(items)} items from {file_path}")
-        return items
-    except FileNotFoundError:
-        logging.error(f"The file {file_path} was not found.")
-        return None
-    except json.JSONDecodeError:
-        logging.error(f"The file {file_path} is not a valid JSON file.")
-        return None
+def iter_source(file_path):
+    """
+    Yields (item, fingerprint) from a JSON deck or a compiled deck. Fingerprints
+    are only known up front for compiled decks; otherwise they are None.
+    """
+    if is_compiled_deck(file_path):
+        yield from iter_deck(file_path)
+    else:
+        for item in iter_items(file_path):
+            yield item, None
 
-def validate_data(item_list):
+def validate_file(file_path):
+    """
+    Strict mode: validates every item in one streaming pass before anything is sent.
+    Returns (item_count, is_valid, error_summary); only the error strings are kept.
+    """
     logging.info("Starting pre-validation process...")
     errors = []
-    for i, item in enumerate(item_list):
-        content_type = item.get('type', 'poll')
-        if content_type == 'poll':
-            question, options, explanation = item.get('question',''), item.get('options',[]), item.get('explanation','')
-            prefixed_question_len = len(QUESTION_PREFIX) + len(question)
-            
-            if not question: errors.append(f"Item #{i+1}: Poll question is empty.")
-            if prefixed_question_len > LIMITS["POLL_QUESTION"]: 
-                errors.append(f"Item #{i+1}: Prefixed question length ({prefixed_question_len}) > limit ({LIMITS['POLL_QUESTION']}). Original length: {len(question)}.")
-            if len(options) > LIMITS["POLL_MAX_OPTIONS"]: errors.append(f"Item #{i+1}: Option count ({len(options)}) > limit ({LIMITS['POLL_MAX_OPTIONS']}).")
-            if len(options) < 2: errors.append(f"Item #{i+1}: Poll must have at least 2 options.")
-            for o_idx, opt in enumerate(options):
-                if len(opt) > LIMITS["POLL_OPTION"]: errors.append(f"Item #{i+1} Option #{o_idx+1}: Length ({len(opt)}) > limit ({LIMITS['POLL_OPTION']}).")
-            if explanation and len(explanation) > LIMITS["POLL_EXPLANATION"]: 
-                logging.warning(f"Item #{i+1}: Explanation length ({len(explanation)}) > limit ({LIMITS['POLL_EXPLANATION']}). Will be auto-trimmed if sent.")
-        elif content_type == 'message':
-            text = item.get('text', '')
-            if not text: errors.append(f"Item #{i+1}: Message text is empty.")
-            if len(text) > LIMITS["MESSAGE_TEXT"]: errors.append(f"Item #{i+1}: Message length ({len(text)}) > limit ({LIMITS['MESSAGE_TEXT']}).")
+    count = 0
+    for i, (item, _) in enumerate(iter_source(file_path)):
+        item_errors = validate_item(i, item)
+        for error in item_errors: logging.error(f"Validation Error: {error}")
+        errors.extend(item_errors)
+        count += 1
 
     if errors:
-        for error in errors: logging.error(f"Validation Error: {error}")
-        return False, "\n".join(errors)
-    else:
-        logging.info("Validation successful. All items conform to basic limits.")
-        return True, ""
+        return count, False, "\n".join(errors)
+    logging.info(f"Validation successful. All {count} items conform to basic limits.")
+    return count, True, ""
+
+def find_near_duplicates(file_path):
+    """
+    Deck positions of items that near-duplicate an earlier item (see common/dedup.py),
+    for --skip-duplicates. Pairs that differ in their answer are only reported.
+    """
+    index = NearDuplicateIndex()
+    for i, (item, _) in enumerate(iter_source(file_path)):
+        index.add_item(i, item)
+    duplicates, conflicts = index.find()
+    for position, (earlier, score) in sorted(duplicates.items()):
+        logging.info(f"Item {index.keys[position] + 1} is a near-duplicate of item {index.keys[earlier] + 1} (similarity {score:.2f}); skipping it.")
+    for earlier, later, score in conflicts:
+        logging.warning(f"Items {index.keys[earlier] + 1} and {index.keys[later] + 1} look alike (similarity {score:.2f}) but have different answers; sending both.")
+    return {index.keys[position] for position in duplicates}
 
 # ====== TELEGRAM API CORE FUNCTIONS ======
+def start_log_sink(bot):
+    """Routes send_log_to_telegram through a background, coalescing LogSink for this run."""
+    global LOG_SINK
+    if not LOG_CHANNEL_ID: return
+    async def send(text, parse_mode):
+        await bot.send_message(chat_id=LOG_CHANNEL_ID, text=text, parse_mode=parse_mode)
+    LOG_SINK = LogSink(send, max_chars=LIMITS["MESSAGE_TEXT"]).start()
+
+async def stop_log_sink():
+    global LOG_SINK
+    if LOG_SINK:
+        await LOG_SINK.close()
+        LOG_SINK = None
+
 async def send_log_to_telegram(bot, message, level="INFO"):
     if not LOG_CHANNEL_ID: return
     level_icon = {"INFO": "ℹ️", "WARNING": "⚠️", "ERROR": "❌", "CRITICAL": "🔥"}.get(level, "🤖")
+    safe_message = f"{level_icon} {level}\n\n<pre>{html.escape(truncate(message, 4000))}</pre>"
+    if LOG_SINK:
+        # Never blocks: the sink batches entries into digest posts in the background.
+        LOG_SINK.post(safe_message, HIGH if level in ("WARNING", "ERROR", "CRITICAL") else LOW)
+        return
     try:
-        safe_message = f"{level_icon} {level}\n\n<pre>{message[:4000]}</pre>"
         await bot.send_message(chat_id=LOG_CHANNEL_ID, text=safe_message, parse_mode='HTML')
     except Exception as e:
         logging.error(f"CRITICAL: Failed to send log message to Telegram log channel: {e}")
 
-async def safe_send(bot, func, *args, **kwargs):
+async def safe_send(pool, method, **kwargs):
+    # Payloads are fitted to Telegram's limits before sending (see build_payload),
+    # so a BadRequest here is a genuine error rather than something trimming could fix.
+    chat_id = kwargs.get('chat_id')
     for attempt in range(1, 6):
+        member = None
         try:
-            return await func(*args, **kwargs)
+            member = await pool.acquire(chat_id)
+            with METRICS.call(method, chat=chat_id, bot=member.bot_id):
+                result = await getattr(member.bot, method)(read_timeout=call_timeout(method), **kwargs)
+            member.on_success(chat_id)
+            METRICS.record_attempts(attempt)
+            return result
         except RetryAfter as e:
-            wait_time = int(e.retry_after) + 1
-            logging.warning(f"Flood control: received RetryAfter({e.retry_after}s). Waiting {wait_time}s...")
-            await asyncio.sleep(wait_time)
+            # The bot's limiter holds it back for the flood wait and slows it down;
+            # with a pool the retry goes to whichever other bot can send soonest.
+            logging.warning(f"Flood control: bot {member.bot_id} received RetryAfter({e.retry_after}s). Backing off...")
+            member.on_retry_after(chat_id, e.retry_after)
         
         except BadRequest as e:
-            error_text = str(e).lower()
-            if "too long" in error_text:
-                if 'question' in kwargs and len(kwargs['question']) > LIMITS["POLL_QUESTION"]:
-                    original_len = len(kwargs['question'])
-                    kwargs['question'] = kwargs['question'][:LIMITS["POLL_QUESTION"]]
-                    logging.warning(f"Caught BadRequest. Question auto-trimmed from {original_len} to {len(kwargs['question'])}. Retrying.")
-                    continue
-                elif 'explanation' in kwargs and kwargs.get('explanation') and len(kwargs['explanation']) > LIMITS["POLL_EXPLANATION"]:
-                    original_len = len(kwargs['explanation'])
-                    kwargs['explanation'] = kwargs['explanation'][:LIMITS["POLL_EXPLANATION"] - 5]
-                    logging.warning(f"Caught BadRequest. Explanation auto-trimmed from {original_len} to {len(kwargs['explanation'])}. Retrying.")
-                    continue
-            
             logging.error(f"Unrecoverable BadRequest on attempt {attempt}: {e}")
+            METRICS.record_attempts(attempt)
             raise e
 
         except (TimedOut, NetworkError) as e:
-            error_text = str(e).lower()
-            if "too long" in error_text:
-                if 'question' in kwargs and len(kwargs['question']) > LIMITS["POLL_QUESTION"]:
-                    original_len = len(kwargs['question'])
-                    kwargs['question'] = kwargs['question'][:LIMITS["POLL_QUESTION"]]
-                    logging.warning(f"Caught NetworkError wrapping 'too long'. Question auto-trimmed from {original_len} to {len(kwargs['question'])}. Retrying.")
-                    continue
-                elif 'explanation' in kwargs and kwargs.get('explanation') and len(kwargs['explanation']) > LIMITS["POLL_EXPLANATION"]:
-                    original_len = len(kwargs['explanation'])
-                    kwargs['explanation'] = kwargs['explanation'][:LIMITS["POLL_EXPLANATION"] - 5]
-                    logging.warning(f"Caught NetworkError wrapping 'too long'. Explanation auto-trimmed from {original_len} to {len(kwargs['explanation'])}. Retrying.")
-                    continue
-            
             wait_seconds = 3 * attempt
             logging.warning(f"Network issue on attempt {attempt}: {e}. Retrying in {wait_seconds}s...")
-            await asyncio.sleep(wait_seconds)
+            await network_retry_sleep(wait_seconds)
 
         except Exception as e:
             logging.error(f"Unexpected error on attempt {attempt}: {e}")
-            if attempt == 5: raise e
-            await asyncio.sleep(2 * attempt)
-            
+            if attempt == 5:
+                METRICS.record_attempts(attempt)
+                raise e
+            await network_retry_sleep(2 * attempt)
+
+    METRICS.record_attempts(5)
     raise Exception(f"Failed to send message after 5 attempts.")
 
 # ====== MAIN PROCESSING LOGIC ======
-async def process_items_in_batches(json_file_path):
-    if not BOT_TOKEN or not CHAT_ID:
+class SendHalted(Exception):
+    """Stops one chat's lane; send_items turns it into SystemExit once every lane has finished."""
+
+def make_rate_limiter(preset, token=BOT_TOKEN, **kwargs):
+    kwargs.setdefault("sleep", METRICS.sleeper("rate_limit"))
+    if preset == "conservative":
+        return create_limiter(preset, min_delay=MIN_DELAY_SECONDS, max_delay=MAX_DELAY_SECONDS,
+                              batch_size=BATCH_SIZE, batch_delay=BATCH_DELAY_SECONDS, **kwargs)
+    return create_limiter(preset, bot_id=bot_id_from_token(token), **kwargs)
+
+def make_bot_pool(preset):
+    """BOT_TOKEN plus any BOT_TOKENS, each bot paced by its own limiter."""
+    return BotPool.from_tokens(
+        pool_tokens(BOT_TOKEN, BOT_TOKENS),
+        lambda token: Bot(token=token, base_url=f"{TELEGRAM_API_URL}/bot", request=ptb_request()),
+        lambda token: make_rate_limiter(preset, token),
+    )
+
+async def prune_stale_items(pool, chat_id, ledger, stale_keys):
+    """
+    Deletes posts whose content is no longer in the deck and drops them from the
+    ledger. A batch Telegram refuses to delete (e.g. posts older than 48 hours)
+    is logged and its entries stay in the ledger, so the posts are not forgotten.
+    """
+    message_ids = sorted(ledger.message_id(key) for key in stale_keys if ledger.message_id(key))
+    kept = set()
+    for start in range(0, len(message_ids), DELETE_BATCH_SIZE):
+        batch = message_ids[start:start + DELETE_BATCH_SIZE]
+        try:
+            await safe_send(pool, "delete_messages", chat_id=chat_id, message_ids=batch)
+        except BadRequest as e:
+            error_details = f"Could not prune posts {batch[0]}-{batch[-1]} from {chat_id}: {e}"
+            logging.error(error_details)
+            await send_log_to_telegram(pool.bot, error_details, "ERROR")
+            kept.update(batch)
+    for key in stale_keys:
+        if ledger.message_id(key) not in kept:
+            ledger.forget(key)
+    logging.info(f"Pruned {len(message_ids) - len(kept)} stale posts from {chat_id} "
+                 f"({len(stale_keys)} stale ledger entries, {len(kept)} kept after errors).")
+
+def build_payload(item):
+    """
+    Telegram-ready send kwargs for one item, fitted to the limits before the first
+    request so no rate-limited call is wasted on a "too long" rejection.
+    Built once per item and chat and not kept, so memory stays bounded by the send queue.
+    """
+    content_type = item.get('type', 'poll')
+    if content_type == 'message':
+        payload = {"text": item['text'], "parse_mode": 'HTML'}
+    else:
+        question_text = truncate(f"{QUESTION_PREFIX}{item['question']}", LIMITS["POLL_QUESTION"])
+        options = [truncate(option, LIMITS["POLL_OPTION"]) for option in item["options"]]
+        payload = {"question": question_text, "options": options, "is_anonymous": True}
+        if item.get('correct_option') is not None:
+            explanation = item.get('explanation')
+            if explanation:
+                explanation = truncate(limit_line_feeds(explanation, POLL_EXPLANATION_MAX_LINE_FEEDS), LIMITS["POLL_EXPLANATION"])
+            payload.update({"type": "quiz", "correct_option_id": item['correct_option'], "explanation": explanation})
+        else:
+            payload.update({"type": "regular"})
+    return payload
+
+async def send_item(pool, chat_id, item):
+    payload = build_payload(item)
+    if item.get('type', 'poll') == 'message':
+        return await safe_send(pool, "send_message", chat_id=chat_id, **payload)
+    return await safe_send(pool, "send_poll", chat_id=chat_id, **payload)
+
+async def produce_items(json_file_path, queue, validate_each):
+    """
+    Parses the deck incrementally and feeds (index, item, fingerprint, errors) into the
+    bounded send queue; a full queue pauses parsing until the sender catches up. None marks the end.
+    """
+    try:
+        for i, (item, fingerprint) in enumerate(iter_source(json_file_path)):
+            errors = validate_item(i, item) if validate_each else []
+            await queue.put((i, item, fingerprint, errors))
+            if errors:
+                return
+    except json.JSONDecodeError as e:
+        await queue.put((None, None, None, [f"The file {json_file_path} is not a valid JSON file: {e}"]))
+        return
+    await queue.put(None)
+
+async def process_items_in_batches(json_file_path, rate_preset=RATE_LIMIT_PRESET, fresh=False,
+                                   incremental=False, prune=False, seed_ledger=False, validation="strict",
+                                   skip_duplicates=False, allow_empty_ledger=False, pool=None):
+    """`pool` lets a long-running caller (tools/dispatcher.py) reuse its bots and limiters across runs."""
+    if not BOT_TOKEN or not CHAT_IDS:
         logging.critical("BOT_TOKEN or CHAT_ID environment variables are not set. Aborting.")
         return
 
-    bot = Bot(token=BOT_TOKEN)
+    if pool is None:
+        pool = make_bot_pool(rate_preset)
+    start_log_sink(pool.bot)
+    try:
+        await send_items(pool, json_file_path, rate_preset, fresh, incremental, prune, seed_ledger, validation,
+                         skip_duplicates, allow_empty_ledger)
+    finally:
+        # Flush queued log entries even when the run halts with SystemExit.
+        await stop_log_sink()
+        metrics_path = METRICS.write()
+        logging.info(f"Run metrics written to {metrics_path}: {METRICS.summary()}")
+
+async def send_items(pool, json_file_path, rate_preset, fresh, incremental, prune, seed_ledger, validation,
+                     skip_duplicates=False, allow_empty_ledger=False):
+    bot = pool.bot  # log-channel posts always come from the primary bot
     await send_log_to_telegram(bot, "Bot script started a new run.", "INFO")
 
-    item_list = load_items(json_file_path)
-    if not item_list: return
+    if not os.path.exists(json_file_path):
+        logging.error(f"The file {json_file_path} was not found.")
+        return
 
-    is_valid, error_summary = validate_data(item_list)
-    if not is_valid:
-        await send_log_to_telegram(bot, f"Pre-validation failed. Fix errors in source file.\n\nErrors:\n{error_summary}", "CRITICAL")
-        raise SystemExit("Validation failed. Halting execution.")
+    # Strict mode checks the whole deck in one streaming pass before sending anything;
+    # stream mode validates each item just before it is sent and stops at the first bad one.
+    # Compiled decks were validated by tools/compile_deck.py and skip both, unless the
+    # prefix or limits changed since they were compiled.
+    total_items = None
+    if is_compiled_deck(json_file_path):
+        try:
+            header = read_deck_header(json_file_path)
+        except (ValueError, json.JSONDecodeError) as e:
+            logging.error(f"Cannot read compiled deck {json_file_path}: {e}")
+            return
+        if deck_is_current(header):
+            logging.info(f"Compiled deck with {header['count']} pre-validated items; skipping validation.")
+            total_items, validation = header['count'], "none"
+            if not total_items: return
+        else:
+            logging.warning("Compiled deck was built with a different prefix or limits; validating it again.")
+    if validation == "strict":
+        try:
+            total_items, is_valid, error_summary = validate_file(json_file_path)
+        except json.JSONDecodeError:
+            logging.error(f"The file {json_file_path} is not a valid JSON file.")
+            return
+        if not is_valid:
+            await send_log_to_telegram(bot, f"Pre-validation failed. Fix errors in source file.\n\nErrors:\n{error_summary}", "CRITICAL")
+            raise SystemExit("Validation failed. Halting execution.")
+        if not total_items: return
 
-    total_items = len(item_list)
-    logging.info(f"Starting to send all {total_items} items in batches of {BATCH_SIZE}...")
-    await send_log_to_telegram(bot, f"Processing {total_items} items from {json_file_path} in batches of {BATCH_SIZE}.")
+    # One extra pass over the deck; the first copy of every near-duplicate group is sent.
+    skip = find_near_duplicates(json_file_path) if skip_duplicates and not seed_ledger else frozenset()
+    if skip:
+        await send_log_to_telegram(bot, f"Skipping {len(skip)} near-duplicate items.", "INFO")
 
-    for i, item in enumerate(item_list):
-        content_type = item.get('type', 'poll')
-        logging.info(f"Processing item {i + 1} of {total_items} (type: {content_type})...")
+    # Every destination chat is its own lane with its own ledger and journal; lanes run
+    # concurrently and each keeps the deck order in its chat.
+    source_hash = file_sha256(json_file_path)
+    lanes = {
+        chat_id: send_to_chat(pool, chat_id, json_file_path, source_hash, total_items, rate_preset,
+                              fresh, incremental, prune, seed_ledger, validation, skip, allow_empty_ledger)
+        for chat_id in CHAT_IDS
+    }
+    try:
+        results = await run_lanes(lanes)
+    finally:
+        pool.save()
+        if len(pool) > 1: logging.info(f"Bot pool: {pool.summary()}.")
+        logging.info(f"Transport: {CONNECTION_STATS.summary()}.")
+    error = first_error(results)
+    if isinstance(error, SendHalted):
+        raise SystemExit(str(error))
+    if error:
+        raise error
 
-        try:
-            if content_type == 'message':
-                await safe_send(bot, bot.send_message, chat_id=CHAT_ID, text=item['text'], parse_mode='HTML')
-            elif content_type == 'poll':
-                question_text = f"{QUESTION_PREFIX}{item['question']}"
-                poll_kwargs = {"chat_id": CHAT_ID, "question": question_text, "options": item["options"], "is_anonymous": True}
-                if item.get('correct_option') is not None:
-                    poll_kwargs.update({"type": "quiz", "correct_option_id": item['correct_option'], "explanation": item.get('explanation')})
-                else:
-                    poll_kwargs.update({"type": "regular"})
-                await safe_send(bot, bot.send_poll, **poll_kwargs)
-
-            logging.info(f"Item {i + 1} sent successfully.")
-
-            # Short delay between each message
-            delay = random.uniform(MIN_DELAY_SECONDS, MAX_DELAY_SECONDS)
-            await asyncio.sleep(delay)
-            
-            # Check if a batch is complete and apply the long delay
-            # We use (i + 1) because 'i' is 0-indexed.
-            # We also check that this is not the very last item in the list to avoid a pointless final pause.
-            if (i + 1) % BATCH_SIZE == 0 and (i + 1) < total_items:
-                log_message = f"✅ Batch of {BATCH_SIZE} complete ({i + 1}/{total_items} sent). Pausing for {BATCH_DELAY_SECONDS} seconds."
-                logging.info(log_message)
-                await send_log_to_telegram(bot, log_message, "INFO")
-                await asyncio.sleep(BATCH_DELAY_SECONDS)
+async def send_to_chat(pool, chat_id, json_file_path, source_hash, total_items, rate_preset,
+                       fresh, incremental, prune, seed_ledger, validation, skip=frozenset(),
+                       allow_empty_ledger=False):
+    """
+    Sends the deck to one chat, leaving out the positions in `skip`.
+    Raises SendHalted when this chat's run has to stop.
+    """
+    bot = pool.bot
+    total_label = total_items if total_items is not None else "?"
+    tag = f"[{chat_id}] " if len(CHAT_IDS) > 1 else ""
 
-        except Exception as e:
-            error_details = f"Failed to send item #{i + 1}.\nType: {content_type}\nError: {e}"
-            logging.critical(error_details)
-            await send_log_to_telegram(bot, error_details, "CRITICAL")
-            raise SystemExit("Halting due to unrecoverable error during sending.")
+    # Without its ledger (first run, or a lost state/ directory) --incremental would
+    # repost the whole deck, so that takes --seed-ledger or an explicit override.
+    if incremental and not seed_ledger and not allow_empty_ledger and not os.path.exists(ledger_path(chat_id)):
+        error_details = (f"{tag}No sent ledger at {ledger_path(chat_id)}; --incremental would repost the whole deck. "
+                         f"Restore the ledger, record an existing channel with --seed-ledger, "
+                         f"or pass --allow-empty-ledger for a new chat.")
+        logging.critical(error_details)
+        await send_log_to_telegram(bot, error_details, "CRITICAL")
+        raise SendHalted("No sent ledger for --incremental. Halting execution.")
+
+    # The ledger remembers which content is already in the channel, whatever file it came from.
+    ledger = SentLedger(chat_id)
+    deck = deck_name(json_file_path)
+    journal = None
+    producer = None
+    try:
+        keyer = LedgerKeyer()
+        if seed_ledger:
+            seeded = 0
+            for item, fingerprint in iter_source(json_file_path):
+                key = keyer(item, fingerprint)
+                if key not in ledger:
+                    ledger.record(key, None, deck)
+                    seeded += 1
+            logging.info(f"{tag}Ledger seeded with {seeded} items without sending anything.")
+            return
+
+        # Items confirmed sent by an earlier, interrupted run of this exact file are skipped.
+        journal = Journal("send_polls", chat_id, source_hash)
+        if fresh and len(journal):
+            journal.discard()
+        if len(journal):
+            resume_message = f"{tag}Resuming from checkpoint: {len(journal)}/{total_label} items already sent."
+            logging.info(resume_message)
+            await send_log_to_telegram(bot, resume_message, "INFO")
+        logging.info(f"{tag}Starting to send {total_label} items (rate preset: {rate_preset}, validation: {validation}, bots: {len(pool)})...")
+        await send_log_to_telegram(bot, f"{tag}Processing {total_label} items from {json_file_path} (rate preset: {rate_preset}).")
 
-    logging.info(f"Successfully sent all {total_items} items.")
-    await send_log_to_telegram(bot, f"🎉 All {total_items} items sent successfully! Task complete.", "INFO")
+        queue = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+        producer = asyncio.create_task(produce_items(json_file_path, queue, validate_each=validation == "stream"))
+        deck_keys = set()
+        sent_count = 0
+        item_count = 0
+
+        while (entry := await queue.get()) is not None:
+            i, item, fingerprint, errors = entry
+            if errors:
+                error_summary = "\n".join(errors)
+                for error in errors: logging.error(f"{tag}Validation Error: {error}")
+                await send_log_to_telegram(bot, f"{tag}Validation failed mid-stream after {sent_count} sends. Fix errors in source file.\n\nErrors:\n{error_summary}", "CRITICAL")
+                raise SendHalted("Validation failed. Halting execution.")
+
+            item_count += 1
+            item_key = keyer(item, fingerprint)
+            deck_keys.add(item_key)
+            if incremental and item_key in ledger and ledger.deck(item_key) is None:
+                # Entries written before decks were recorded go to the first deck that still has them.
+                ledger.record(item_key, ledger.message_id(item_key), deck)
+            if i in skip or i in journal or (incremental and item_key in ledger):
+                continue
+            content_type = item.get('type', 'poll')
+            logging.info(f"{tag}Processing item {i + 1} of {total_label} (type: {content_type})...")
+
+            try:
+                sent_message = await send_item(pool, chat_id, item)
+                journal.record(i, message_id=sent_message.message_id)
+                ledger.record(item_key, sent_message.message_id, deck)
+                sent_count += 1
+                logging.info(f"{tag}Item {i + 1} sent successfully.")
+
+                # Pacing now happens in limiter.acquire() before each send; batches only drive progress reports.
+                # We use (i + 1) because 'i' is 0-indexed, and skip the report after the very last item.
+                if (i + 1) % BATCH_SIZE == 0 and (total_items is None or (i + 1) < total_items):
+                    log_message = f"{tag}✅ Batch of {BATCH_SIZE} complete ({i + 1}/{total_label} sent)."
+                    logging.info(log_message)
+                    await send_log_to_telegram(bot, log_message, "INFO")
+
+            except Exception as e:
+                error_details = f"{tag}Failed to send item #{i + 1}.\nType: {content_type}\nError: {e}"
+                logging.critical(error_details)
+                await send_log_to_telegram(bot, error_details, "CRITICAL")
+                raise SendHalted("Halting due to unrecoverable error during sending.")
+
+        await producer
+        # Every item is sent; the journal only bridges interrupted runs, so running the
+        # same deck again starts over (or, with --incremental, consults the ledger).
+        journal.discard()
+
+        if incremental:
+            # Only this deck's posts can be stale; other decks sent to the chat are left alone.
+            stale_keys = ledger.keys_of_deck(deck) - deck_keys
+            diff_message = f"{tag}Incremental mode: {sent_count} new or changed items sent, {len(stale_keys)} stale posts."
+            logging.info(diff_message)
+            await send_log_to_telegram(bot, diff_message, "INFO")
+            if prune and stale_keys:
+                await prune_stale_items(pool, chat_id, ledger, stale_keys)
+    finally:
+        # Also runs when the dispatcher cancels the job: stop the parser and release the files.
+        if producer is not None and not producer.done():
+            producer.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await producer
+        if journal is not None:
+            journal.close()
+        ledger.close()
+
+    logging.info(f"{tag}Successfully processed all {item_count} items ({sent_count} sent this run).")
+    await send_log_to_telegram(bot, f"{tag}🎉 All {item_count} items processed ({sent_count} sent this run). Task complete.", "INFO")
+
+def plan_run(json_file_path, rate_preset):
+    """
+    --plan: validates the deck, then replays the whole send schedule on a virtual
+    clock with the same limiters, bot pool and chats as a real run. Nothing is sent.
+    """
+    if not os.path.exists(json_file_path):
+        logging.error(f"The file {json_file_path} was not found.")
+        return None
+    if not (is_compiled_deck(json_file_path) and deck_is_current(read_deck_header(json_file_path))):
+        _, is_valid, _ = validate_file(json_file_path)
+        if not is_valid:
+            raise SystemExit("Validation failed. Halting execution.")
+
+    methods = ["send_message" if item.get('type', 'poll') == 'message' else "send_poll"
+               for item, _ in iter_source(json_file_path)]
+    clock = VirtualClock()
+    pool = BotPool.from_tokens(
+        pool_tokens(BOT_TOKEN or "plan", BOT_TOKENS),
+        lambda token: None,
+        lambda token: make_rate_limiter(rate_preset, token, clock=clock, sleep=clock.sleep, rng=MeanRandom),
+    )
+    plan = simulate({chat_id: methods for chat_id in CHAT_IDS or ["CHAT_ID"]}, pool.acquire, clock)
+    logging.info(f"Plan for {len(methods)} items (rate preset: {rate_preset}, bots: {len(pool)}, chats: {len(CHAT_IDS) or 1}):")
+    for line in plan.report():
+        logging.info(line)
+    return plan
 
 # ====== MAIN EXECUTION BLOCK ======
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Telegram Poll Bot with Batch Sending")
-    parser.add_argument("json_file", help="Path to the source JSON file.")
+    parser.add_argument("json_file", help="Path to the source JSON file or a compiled *.deck.jsonl deck.")
+    parser.add_argument("--rate-preset", choices=sorted(available_presets()), default=RATE_LIMIT_PRESET,
+                        help="Rate limiting policy (default: %(default)s, or $RATE_LIMIT_PRESET).")
+    parser.add_argument("--fresh", action="store_true",
+                        help="Ignore the checkpoint journal and send every item again.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only send items whose content is not in the sent ledger yet.")
+    parser.add_argument("--prune", action="store_true",
+                        help="With --incremental, delete posts whose content was edited or removed from the deck.")
+    parser.add_argument("--seed-ledger", action="store_true",
+                        help="Record the deck as already posted without sending (first run against an existing channel).")
+    parser.add_argument("--allow-empty-ledger", action="store_true",
+                        help="Let --incremental start without a sent ledger (a new chat); otherwise it refuses to run.")
+    parser.add_argument("--validation", choices=["strict", "stream"], default="strict",
+                        help="strict: validate the whole deck before sending (default); "
+                             "stream: validate each item as it is parsed and start sending immediately.")
+    parser.add_argument("--skip-duplicates", action="store_true",
+                        help="Do not send items that near-duplicate an earlier item of the deck (see tools/find_duplicates.py).")
+    parser.add_argument("--plan", "--dry-run", dest="plan", action="store_true",
+                        help="Validate the deck and estimate run time, API calls and peak rate without sending anything.")
     args = parser.parse_args()
 
-    asyncio.run(process_items_in_batches(args.json_file))
+    if args.plan:
+        plan_run(args.json_file, args.rate_preset)
+        raise SystemExit(0)
+
+    asyncio.run(process_items_in_batches(args.json_file, args.rate_preset, args.fresh,
+                                         args.incremental, args.prune, args.seed_ledger, args.validation,
+                                         args.skip_duplicates, args.allow_empty_ledger))
@@ -1,14 +1,35 @@
+import argparse
+import asyncio
+import contextlib
 import os
-import time
 import re
+import sys
 
 from telegram import Bot
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+
+# Run from the repository root by the workflow; make the shared helpers importable from anywhere.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from common import TELEGRAM_API_URL
+from common.flood import bot_id_from_token
+from common.metrics import Metrics
+from common.planner import MeanRandom, VirtualClock, simulate
+from common.ratelimit import create_limiter
+from common.transport import CONNECTION_STATS, call_timeout, ptb_request
 
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 CHAT_ID = os.getenv("CHAT_ID")  # fallback if not extracted from link
-bot = Bot(token=BOT_TOKEN)
+# "adaptive" learns the safe call rate across runs; see common/ratelimit.py for the other presets.
+RATE_LIMIT_PRESET = os.getenv("RATE_LIMIT_PRESET", "adaptive")
 
 RANGE_FILE = "telegram_bulk_delete/ranges/delete_range.txt"
+DELETE_BATCH_SIZE = 100  # Telegram's maximum for deleteMessages
+# Attempts per deleteMessages call when the network times out or drops the connection.
+NETWORK_ATTEMPTS = 5
+
+# Per-run call counts, latencies and wait times, written to metrics/bulk_delete.{prom,json}.
+METRICS = Metrics("bulk_delete")
+network_retry_sleep = METRICS.sleeper("network_retry")
 
 def extract_ids_from_link(link: str):
     """
@@ -32,10 +53,10 @@ def extract_ids_from_link(link: str):
 
     return chat_id, msg_id
 
-def read_range_from_file():
+def read_range_from_file(path=None):
     start_link = None
     end_link = None
-    with open(RANGE_FILE, "r") as f:
+    with open(path or RANGE_FILE, "r") as f:
         for line in f:
             if line.startswith("START="):
                 start_link = line.split("=", 1)[1].strip()
@@ -45,20 +66,159 @@ def read_range_from_file():
         raise ValueError("delete_range.txt must contain START=... and END=... lines")
     return start_link, end_link
 
-def bulk_delete(start_link, end_link):
-    chat_id, start_id = extract_ids_from_link(start_link)
-    _, end_id = extract_ids_from_link(end_link)
+def chunk_ids(start_id, end_id, size=DELETE_BATCH_SIZE):
+    """Splits an inclusive ID range into consecutive lists of at most `size` IDs."""
+    for chunk_start in range(start_id, end_id + 1, size):
+        yield list(range(chunk_start, min(chunk_start + size, end_id + 1)))
 
-    print(f"🚨 Deleting messages {start_id} → {end_id} in chat {chat_id}")
+def make_bot(token=BOT_TOKEN):
+    return Bot(token=token, base_url=f"{TELEGRAM_API_URL}/bot", request=ptb_request())
+
+def make_limiter(token=BOT_TOKEN):
+    return create_limiter(RATE_LIMIT_PRESET, bot_id=bot_id_from_token(token), sleep=METRICS.sleeper("rate_limit"))
 
-    for msg_id in range(start_id, end_id + 1):
+async def delete_one(bot, limiter, chat_id, msg_id, counts):
+    attempts = 0
+    while True:
+        attempts += 1
         try:
-            bot.delete_message(chat_id=chat_id, message_id=msg_id)
+            await limiter.acquire(chat_id)
+            with METRICS.call("delete_message", chat=chat_id):
+                await bot.delete_message(chat_id=chat_id, message_id=msg_id)
+            limiter.on_success(chat_id)
+            counts["deleted"] += 1
             print(f"✅ Deleted {msg_id}")
+        except RetryAfter as e:
+            print(f"⏳ Flood control at {msg_id}: waiting {e.retry_after}s")
+            limiter.on_retry_after(chat_id, e.retry_after)
+            continue
+        except Forbidden as e:
+            counts["forbidden"] += 1
+            print(f"⛔ Not allowed to delete {msg_id}: {e}")
+        except BadRequest as e:
+            error_text = str(e).lower()
+            if "not found" in error_text:
+                counts["missing"] += 1
+                print(f"🗑️ Already gone {msg_id}")
+            elif "can't be deleted" in error_text:
+                counts["forbidden"] += 1
+                print(f"⛔ Not allowed to delete {msg_id}: {e}")
+            else:
+                counts["failed"] += 1
+                print(f"⚠️ Could not delete {msg_id}: {e}")
         except Exception as e:
+            counts["failed"] += 1
             print(f"⚠️ Could not delete {msg_id}: {e}")
-        time.sleep(0.5)  # avoid rate limits
+        METRICS.record_attempts(attempts)
+        return
+
+async def delete_chunk(bot, limiter, chat_id, ids, counts):
+    """
+    Deletes up to DELETE_BATCH_SIZE messages with one deleteMessages call.
+
+    deleteMessages also succeeds for IDs that no longer exist, without saying
+    which, so a successful chunk is counted as "deleted or already gone". Chunks
+    the API rejects with BadRequest are retried one ID at a time to get exact
+    deleted/missing/forbidden counts. Network errors retry the whole batch;
+    deleting is idempotent, so a batch that did go through is harmless to resend.
+    """
+    attempts = network_attempts = 0
+    while True:
+        attempts += 1
+        try:
+            await limiter.acquire(chat_id)
+            with METRICS.call("delete_messages", chat=chat_id, ids=len(ids)):
+                ok = await bot.delete_messages(chat_id=chat_id, message_ids=ids,
+                                               read_timeout=call_timeout("delete_messages"))
+            limiter.on_success(chat_id)
+            break
+        except RetryAfter as e:
+            print(f"⏳ Flood control at {ids[0]}-{ids[-1]}: waiting {e.retry_after}s")
+            limiter.on_retry_after(chat_id, e.retry_after)
+        except BadRequest as e:
+            print(f"🔁 Batch {ids[0]}-{ids[-1]} rejected ({e}); deleting one by one")
+            ok = False
+            break
+        except Forbidden as e:
+            METRICS.record_attempts(attempts)
+            counts["forbidden"] += len(ids)
+            print(f"⛔ Not allowed to delete {ids[0]}-{ids[-1]}: {e}")
+            return
+        except NetworkError as e:
+            # TimedOut is a NetworkError too.
+            network_attempts += 1
+            if network_attempts < NETWORK_ATTEMPTS:
+                print(f"🌐 Network issue at {ids[0]}-{ids[-1]} ({e}); retrying in {3 * network_attempts}s")
+                await network_retry_sleep(3 * network_attempts)
+                continue
+            METRICS.record_attempts(attempts)
+            counts["failed"] += len(ids)
+            print(f"⚠️ Could not delete {ids[0]}-{ids[-1]} after {network_attempts} network errors: {e}")
+            return
+        except Exception as e:
+            METRICS.record_attempts(attempts)
+            counts["failed"] += len(ids)
+            print(f"⚠️ Could not delete {ids[0]}-{ids[-1]}: {e}")
+            return
+    METRICS.record_attempts(attempts)
+
+    if ok:
+        counts["deleted_or_gone"] += len(ids)
+        print(f"✅ Deleted or already gone: {ids[0]}-{ids[-1]}")
+        return
+    for msg_id in ids:
+        await delete_one(bot, limiter, chat_id, msg_id, counts)
+
+async def bulk_delete(start_link, end_link, bot=None, limiter=None):
+    """
+    Deletes every message between the two links. A long-running caller
+    (tools/dispatcher.py) passes an already open `bot` and its `limiter`.
+    """
+    chat_id, start_id = extract_ids_from_link(start_link)
+    _, end_id = extract_ids_from_link(end_link)
+
+    print(f"🚨 Deleting messages {start_id} → {end_id} in chat {chat_id}")
+
+    counts = {"deleted": 0, "deleted_or_gone": 0, "missing": 0, "forbidden": 0, "failed": 0}
+    limiter = limiter or make_limiter()
+    try:
+        async with contextlib.nullcontext(bot) if bot else make_bot() as bot:
+            for ids in chunk_ids(start_id, end_id):
+                await delete_chunk(bot, limiter, chat_id, ids, counts)
+    finally:
+        # Keep the learned rates and the metrics of a run that crashed or was cancelled halfway.
+        limiter.save()
+        print(f"📊 Metrics written to {METRICS.write()}: {METRICS.summary()}")
+
+    print(
+        f"🏁 Done: {counts['deleted_or_gone']} deleted or already gone (batched), "
+        f"{counts['deleted']} deleted, {counts['missing']} missing, "
+        f"{counts['forbidden']} forbidden, {counts['failed']} failed"
+    )
+    print(f"🔌 {CONNECTION_STATS.summary()}")
+    return counts
+
+def plan_delete(start_link, end_link):
+    """--plan: replays the deleteMessages calls on a virtual clock with the configured preset."""
+    chat_id, start_id = extract_ids_from_link(start_link)
+    _, end_id = extract_ids_from_link(end_link)
+    clock = VirtualClock()
+    limiter = create_limiter(RATE_LIMIT_PRESET, bot_id=bot_id_from_token(BOT_TOKEN), clock=clock, sleep=clock.sleep, rng=MeanRandom)
+    calls = ["delete_messages"] * len(range(start_id, end_id + 1, DELETE_BATCH_SIZE))
+    plan = simulate({chat_id: calls}, limiter.acquire, clock)
+    print(f"📋 Plan for deleting {start_id} → {end_id} in chat {chat_id} (rate preset: {RATE_LIMIT_PRESET}):")
+    for line in plan.report():
+        print(f"  {line}")
+    return plan
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Delete a range of messages listed in delete_range.txt.")
+    parser.add_argument("--plan", "--dry-run", dest="plan", action="store_true",
+                        help="Estimate run time and API calls without deleting anything.")
+    args = parser.parse_args()
+
     start, end = read_range_from_file()
-    bulk_delete(start, end)
+    if args.plan:
+        plan_delete(start, end)
+    else:
+        asyncio.run(bulk_delete(start, end))
@@ -0,0 +1,168 @@
+"""
+Throughput benchmarks for send_polls.py, forwarder/forward.py and
+telegram_bulk_delete/scripts/bulk_delete.py against tools/fake_bot_api.py.
+
+Each scenario runs the real script as a subprocess with TELEGRAM_API_URL
+pointed at an in-process fake server, a throwaway state directory and the
+"unlimited" rate preset (enabled by QUIZHUB_BENCHMARK=1), so the numbers measure
+the client's own overhead (payload building, journaling, HTTP round trips) plus
+the injected latency. Items/s is taken over the script's own run_seconds, so
+interpreter start-up and imports do not count against it.
+
+    python tools/benchmark.py                              # all scenarios, 500 items
+    python tools/benchmark.py send_polls --items 5000 --latency-ms 40
+    python tools/benchmark.py --retry-after-rate 0.02 --json results.json
+
+Latency percentiles are measured on the server side, i.e. per request served.
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import REPO_ROOT
+from tools.fake_bot_api import add_fault_arguments, faults_from_args, start_server
+
+BOT_TOKEN = "123456:benchmark"
+CHAT_ID = "-1001234567890"
+SOURCE_CHANNEL = "benchmark_source"
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def synthetic_deck(count):
+    return [
+        {
+            "question": f"{i + 1:02d}। Benchmark question number {i + 1}? [MediX]",
+            "options": [f"Option {letter} for {i + 1}" for letter in "ABCD"],
+            "correct_option": i % 4,
+            "explanation": f"Explanation for question {i + 1}.",
+        }
+        for i in range(count)
+    ]
+
+
+def setup_send_polls(workdir, items):
+    path = os.path.join(workdir, "deck.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(synthetic_deck(items), f, ensure_ascii=False)
+    return [sys.executable, os.path.join(REPO_ROOT, "send_polls.py"), path, "--rate-preset", "unlimited"]
+
+
+def setup_forward(workdir, items):
+    with open(os.path.join(workdir, "forwardrange.txt"), "w") as f:
+        f.write(f"https://t.me/{SOURCE_CHANNEL}/1\nhttps://t.me/{SOURCE_CHANNEL}/{items}\n")
+    return [sys.executable, os.path.join(REPO_ROOT, "forwarder", "forward.py")]
+
+
+def setup_bulk_delete(workdir, items):
+    ranges = os.path.join(workdir, "telegram_bulk_delete", "ranges")
+    os.makedirs(ranges)
+    with open(os.path.join(ranges, "delete_range.txt"), "w") as f:
+        f.write(f"START=https://t.me/c/1234567890/1\nEND=https://t.me/c/1234567890/{items}\n")
+    return [sys.executable, os.path.join(REPO_ROOT, "telegram_bulk_delete", "scripts", "bulk_delete.py")]
+
+
+SCENARIOS = {
+    "send_polls": setup_send_polls,
+    "forward": setup_forward,
+    "bulk_delete": setup_bulk_delete,
+}
+
+
+def run_scenario(name, items, base_url, api, extra_env=None):
+    """Runs one script against the fake server and returns its result record."""
+    api.reset_stats()
+    with tempfile.TemporaryDirectory(prefix=f"bench-{name}-") as workdir:
+        command = SCENARIOS[name](workdir, items)
+        env = {
+            **os.environ,
+            "BOT_TOKEN": BOT_TOKEN,
+            "CHAT_ID": CHAT_ID,
+            "DEST_CHANNEL_ID": CHAT_ID,
+            "TELEGRAM_API_URL": base_url,
+            "RATE_LIMIT_PRESET": "unlimited",
+            "QUIZHUB_BENCHMARK": "1",
+            "QUIZHUB_STATE_DIR": os.path.join(workdir, "state"),
+            "QUIZHUB_METRICS_DIR": os.path.join(workdir, "metrics"),
+            **(extra_env or {}),
+        }
+        env.pop("LOG_CHANNEL_ID", None)
+        started = time.perf_counter()
+        completed = subprocess.run(command, cwd=workdir, env=env, capture_output=True, text=True)
+        wall = time.perf_counter() - started
+        # The script's own view (common.metrics): time spent sleeping vs. in API calls.
+        client = {}
+        metrics_path = os.path.join(workdir, "metrics", f"{name}.json")
+        if os.path.exists(metrics_path):
+            with open(metrics_path, encoding="utf-8") as f:
+                client = json.load(f)["summary"]
+
+    methods = api.stats()
+    result = {
+        "scenario": name,
+        "items": items,
+        "exit_code": completed.returncode,
+        "wall_seconds": round(wall, 3),
+        "items_per_second": round(items / client["run_seconds"], 1) if client.get("run_seconds") else None,
+        "api_calls": sum(m["calls"] for m in methods.values()),
+        "retry_after": sum(m["errors"].get(e, 0) for m in methods.values() for e in m["errors"] if e.startswith("Too Many")),
+        "timeouts": sum(m["errors"].get("timeout", 0) for m in methods.values()),
+        "methods": methods,
+        "client": client,
+    }
+    if completed.returncode != 0:
+        result["stderr_tail"] = completed.stderr[-2000:]
+    return result
+
+
+def print_report(results):
+    header = f"{'scenario':<12} {'items':>7} {'wall s':>8} {'items/s':>9} {'calls':>7} {'429s':>5} {'t/o':>4}  exit"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['scenario']:<12} {r['items']:>7} {r['wall_seconds']:>8} {r['items_per_second']:>9} "
+              f"{r['api_calls']:>7} {r['retry_after']:>5} {r['timeouts']:>4}  {r['exit_code']}")
+        if r["client"]:
+            c = r["client"]
+            print(f"    client: api {c['api_seconds']}s, sleeping {c['sleep_seconds']}, "
+                  f"retry_after {c['retry_after']} ({c['retry_after_seconds']}s)")
+        for method, m in sorted(r["methods"].items()):
+            print(f"    {method:<16} calls={m['calls']:<6} p50={m['p50_ms']}ms p99={m['p99_ms']}ms")
+        if r["exit_code"] != 0:
+            print(r.get("stderr_tail", ""))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the send paths against a local fake Bot API.")
+    parser.add_argument("scenarios", nargs="*", metavar="SCENARIO",
+                        help=f"Scenarios to run: {', '.join(SCENARIOS)} (default: all).")
+    parser.add_argument("--items", type=int, default=500, help="Polls to send / messages to copy or delete.")
+    parser.add_argument("--copy-mode", choices=["batch", "single"], default="batch", help="COPY_MODE for the forwarder.")
+    parser.add_argument("--json", metavar="PATH", help="Also write the results as JSON.")
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    server, api, base_url = start_server(faults_from_args(args))
+    results = []
+    try:
+        for name in args.scenarios or list(SCENARIOS):
+            logging.info(f"Running {name} with {args.items} items against {base_url}")
+            results.append(run_scenario(name, args.items, base_url, api, {"COPY_MODE": args.copy_mode}))
+    finally:
+        server.shutdown()
+
+    print_report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(max((r["exit_code"] != 0 for r in results), default=0))
@@ -0,0 +1,212 @@
+"""
+Compiles quizzes/<subject>/*.json into one manifest plus one content-hashed
+bundle shard per subject, so index.html needs a single request to list every
+quiz and one more per subject the user actually opens.
+
+    python tools/build_bundles.py            # incremental: only changed subjects
+    python tools/build_bundles.py --force    # rebuild every shard
+
+Shard file names contain a hash of their content, so the browser may cache them
+forever; only manifest.json has to be revalidated. A subject is rebuilt when its
+source files or the code that builds the shards (BUILDER_FILES) change.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+from common import deck
+from common.dedup import NearDuplicateIndex
+
+QUIZZES_DIR = os.path.join(REPO_ROOT, "quizzes")
+BUNDLES_DIR = os.path.join(REPO_ROOT, "bundles")
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+# Code that decides what a shard contains; editing it invalidates every shard.
+BUILDER_FILES = (os.path.abspath(__file__), os.path.join(REPO_ROOT, "common", "deck.py"))
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def sha256_hex(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def quiz_title(file_name):
+    """Same title the front end used to derive: 'algebra-basics.json' -> 'Algebra Basics'."""
+    return file_name[:-len(".json")].replace("-", " ").title()
+
+
+def bundle_question(question):
+    """
+    The front end compares the chosen option text with `answer`, so the answer is
+    taken from the option common.deck.normalize_question resolved it to.
+    Raises ValueError like normalize_question.
+    """
+    item = deck.normalize_question(question)
+    correct = item["correct_option"]
+    answer = item["options"][correct] if correct is not None else None
+    bundled = {"question": item["question"], "options": item["options"], "answer": answer}
+    if item.get("explanation"):
+        bundled["explanation"] = item["explanation"]
+    return bundled
+
+
+def load_quiz(path):
+    """
+    Reads either quiz file layout: a bare list of questions or {title, description, questions}.
+    Raises ValueError naming the file and question whose answer does not resolve to an option.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    file_name = os.path.basename(path)
+    if isinstance(data, dict):
+        questions = data.get("questions", [])
+        title = data.get("title") or quiz_title(file_name)
+        description = data.get("description") or f"{len(questions)} questions"
+    else:
+        questions = data
+        title = quiz_title(file_name)
+        description = f"{len(questions)} questions"
+    return {
+        "title": title,
+        "description": description,
+        "questions": [bundle_question_at(path, q_idx, q) for q_idx, q in enumerate(questions)],
+    }
+
+
+def bundle_question_at(path, q_idx, question):
+    try:
+        return bundle_question(question)
+    except ValueError as e:
+        path = os.path.normpath(path)
+        name = os.path.relpath(path, REPO_ROOT)
+        raise ValueError(f"{path if name.startswith('..') else name} question #{q_idx + 1}: {e}") from e
+
+
+def subject_sources(subject_dir):
+    """{relative path: sha256} of every quiz file in a subject, in a stable order."""
+    sources = {}
+    for name in sorted(os.listdir(subject_dir)):
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(subject_dir, name)
+        with open(path, "rb") as f:
+            sources[os.path.relpath(path, REPO_ROOT).replace(os.sep, "/")] = sha256_hex(f.read())
+    return sources
+
+
+def builder_digest():
+    digest = hashlib.sha256()
+    for path in BUILDER_FILES:
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def sources_digest(sources, builder):
+    return sha256_hex(json.dumps({"builder": builder, "sources": sources}, sort_keys=True).encode("utf-8"))
+
+
+def build_shard(subject, sources, bundles_dir):
+    quizzes = [load_quiz(os.path.join(REPO_ROOT, path)) for path in sources]
+    body = json.dumps({"subject": subject, "quizzes": quizzes}, ensure_ascii=False, separators=(",", ":"))
+    data = body.encode("utf-8")
+    shard_name = f"{subject}.{sha256_hex(data)[:12]}.json"
+    with open(os.path.join(bundles_dir, shard_name), "wb") as f:
+        f.write(data)
+    listing = [
+        {"title": quiz["title"], "description": quiz["description"], "count": len(quiz["questions"])}
+        for quiz in quizzes
+    ]
+    return shard_name, listing
+
+
+def flag_duplicates(quizzes_dir, limit=20):
+    """
+    Warns about near-duplicate questions anywhere in the quiz tree (see
+    tools/find_duplicates.py). Only a warning: the bundles keep every question.
+    """
+    index = NearDuplicateIndex()
+    for subject in sorted(os.listdir(quizzes_dir)):
+        subject_dir = os.path.join(quizzes_dir, subject)
+        if not os.path.isdir(subject_dir):
+            continue
+        for path in subject_sources(subject_dir):
+            for q_idx, question in enumerate(load_quiz(os.path.join(REPO_ROOT, path))["questions"]):
+                index.add_item(f"{path} #{q_idx + 1}", question)
+    duplicates, _ = index.find()
+    for later, (earlier, score) in sorted(duplicates.items())[:limit]:
+        logging.warning(f"Near-duplicate question: {index.keys[later]} ~ {index.keys[earlier]} ({score:.2f}).")
+    if duplicates:
+        logging.warning(f"{len(duplicates)} near-duplicate questions in {quizzes_dir}; "
+                        f"run tools/find_duplicates.py for the full report.")
+    return duplicates
+
+
+def load_manifest(bundles_dir):
+    path = os.path.join(bundles_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    return manifest if manifest.get("version") == MANIFEST_VERSION else {}
+
+
+def build(quizzes_dir=QUIZZES_DIR, bundles_dir=BUNDLES_DIR, force=False):
+    os.makedirs(bundles_dir, exist_ok=True)
+    previous = load_manifest(bundles_dir).get("subjects", {})
+    subjects = {}
+    rebuilt = 0
+    builder = builder_digest()
+
+    for subject in sorted(os.listdir(quizzes_dir)):
+        subject_dir = os.path.join(quizzes_dir, subject)
+        if not os.path.isdir(subject_dir):
+            continue
+        sources = subject_sources(subject_dir)
+        if not sources:
+            continue
+        digest = sources_digest(sources, builder)
+        old = previous.get(subject)
+        if (not force and old and old.get("sources_digest") == digest
+                and os.path.exists(os.path.join(bundles_dir, old["shard"]))):
+            subjects[subject] = old
+            continue
+        shard_name, listing = build_shard(subject, sources, bundles_dir)
+        subjects[subject] = {"shard": shard_name, "sources_digest": digest, "quizzes": listing}
+        rebuilt += 1
+        logging.info(f"Built {shard_name} from {len(sources)} files.")
+
+    manifest = {"version": MANIFEST_VERSION, "subjects": subjects}
+    with open(os.path.join(bundles_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write("\n")
+
+    # Shards no subject points at any more are superseded builds.
+    live = {entry["shard"] for entry in subjects.values()}
+    for name in os.listdir(bundles_dir):
+        if name != MANIFEST_NAME and name.endswith(".json") and name not in live:
+            os.remove(os.path.join(bundles_dir, name))
+            logging.info(f"Removed stale shard {name}.")
+
+    logging.info(f"Manifest written: {len(subjects)} subjects, {rebuilt} shards rebuilt.")
+    flag_duplicates(quizzes_dir)
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile quizzes/ into a manifest and per-subject bundle shards.")
+    parser.add_argument("--quizzes-dir", default=QUIZZES_DIR, help="Source quiz tree (default: %(default)s).")
+    parser.add_argument("--out", default=BUNDLES_DIR, help="Output directory (default: %(default)s).")
+    parser.add_argument("--force", action="store_true", help="Rebuild every shard even if its sources are unchanged.")
+    args = parser.parse_args()
+    try:
+        build(args.quizzes_dir, args.out, args.force)
+    except (OSError, ValueError) as e:
+        logging.critical(f"Bundle build failed: {e}")
+        sys.exit(1)
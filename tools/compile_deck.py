@@ -0,0 +1,85 @@
+"""
+Compiles question sources into a pre-validated deck that send_polls can stream
+without re-validating.
+
+Accepts questions.json-style arrays (`correct_option` index) and quizzes/**.json
+files (`answer` text or `correctAnswer` index, optionally wrapped in
+{title, description, questions}), in any mix of files and directories:
+
+    python tools/compile_deck.py questions.json                  # -> questions.deck.jsonl
+    python tools/compile_deck.py quizzes -o build/all.deck.jsonl
+    python send_polls.py build/all.deck.jsonl
+
+Every error in every source is reported in one pass; nothing is written unless
+the whole input is valid.
+"""
+import argparse
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.deck import DECK_SUFFIX, QUESTION_PREFIX, iter_source_questions, normalize_question, validate_item, write_deck
+from common.journal import file_sha256
+from common.ledger import item_fingerprint
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def expand_inputs(paths):
+    """Files as given, directories as every *.json below them in sorted order."""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.endswith(".json"):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def iter_normalized(source_files, errors):
+    """Yields normalized items across all sources; conversion problems are appended to `errors`."""
+    for path in source_files:
+        for q_idx, raw in enumerate(iter_source_questions(path)):
+            try:
+                yield path, q_idx, normalize_question(raw)
+            except ValueError as e:
+                errors.append(f"{path} question #{q_idx + 1}: {e}")
+
+
+def compile_deck(paths, out_path, prefix=QUESTION_PREFIX):
+    source_files = list(expand_inputs(paths))
+    errors = []
+    for i, (path, q_idx, item) in enumerate(iter_normalized(source_files, errors)):
+        errors.extend(validate_item(i, item, prefix, location=f"{path} question #{q_idx + 1}"))
+    if errors:
+        for error in errors: logging.error(f"Validation Error: {error}")
+        return False
+
+    sources = [{"path": path, "sha256": file_sha256(path)} for path in source_files]
+    items = ((item, item_fingerprint(item)) for _, _, item in iter_normalized(source_files, []))
+    written = write_deck(items, out_path, prefix, sources)
+    logging.info(f"Compiled {written} items from {len(source_files)} files into {out_path}.")
+    return True
+
+
+def default_output(paths):
+    if len(paths) == 1 and os.path.isfile(paths[0]) and paths[0].endswith(".json"):
+        return paths[0][:-len(".json")] + DECK_SUFFIX
+    return "deck" + DECK_SUFFIX
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile question files into a pre-validated send_polls deck.")
+    parser.add_argument("inputs", nargs="+", help="Question files or directories to compile.")
+    parser.add_argument("-o", "--out", help=f"Output path (must end in {DECK_SUFFIX}).")
+    parser.add_argument("--prefix", default=QUESTION_PREFIX, help="Question prefix the lengths are checked against.")
+    args = parser.parse_args()
+
+    out_path = args.out or default_output(args.inputs)
+    if not out_path.endswith(DECK_SUFFIX):
+        parser.error(f"Output path must end in {DECK_SUFFIX} so send_polls recognises it.")
+    if not compile_deck(args.inputs, out_path, args.prefix):
+        sys.exit("Validation failed. No deck written.")
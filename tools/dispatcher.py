@@ -0,0 +1,373 @@
+"""
+Long-running dispatcher for send_polls.py, forwarder/forward.py and
+telegram_bulk_delete/scripts/bulk_delete.py.
+
+A workflow run pays for installing dependencies, importing the Telegram
+libraries and opening new sessions, and then often sends only a few dozen
+items. The dispatcher pays that once. It imports each tool on first use and
+keeps the tool's bots, HTTP connection pools and learned limiter rates open
+between jobs. Jobs come from three places:
+
+    file watcher   a changed questions.json, forwarder/forwardrange.txt or
+                   telegram_bulk_delete/ranges/delete_range.txt queues a job
+                   once the file has been stable for one poll interval
+    spool          JSON job files dropped into state/spool (see common/jobqueue.py)
+    control API    POST /jobs on 127.0.0.1
+
+Jobs run one at a time, highest priority first. Two jobs at once would only
+compete for the same bots' flood budgets. The control API reports status and
+cancels jobs:
+
+    python tools/dispatcher.py                          # watch files and spool, API on :8787
+    curl -s localhost:8787/status
+    curl -s -X POST localhost:8787/jobs -d '{"kind": "send", "args": {"file": "questions.json", "fresh": true}}'
+    curl -s -X POST localhost:8787/jobs/<id>/cancel
+
+Cancelling a running job stops it between API calls. Its journal keeps what was
+already sent, so queueing it again resumes from there.
+
+Job files must be inside the repository; other paths are rejected. When
+$QUIZHUB_DAEMON_TOKEN is set, every API request needs the header
+"Authorization: Bearer <token>". The API only binds a non-loopback --host when
+such a token is configured.
+"""
+import argparse
+import asyncio
+import contextlib
+import hmac
+import importlib.util
+import ipaddress
+import json
+import logging
+import os
+import signal
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import REPO_ROOT
+from common.botpool import BotPool
+from common.jobqueue import JobQueue
+from common.transport import CONNECTION_STATS
+
+HOST = "127.0.0.1"
+PORT = int(os.getenv("QUIZHUB_DAEMON_PORT", "8787"))
+WATCH_INTERVAL = float(os.getenv("QUIZHUB_WATCH_INTERVAL", "2"))
+TOKEN = os.getenv("QUIZHUB_DAEMON_TOKEN", "")
+
+# Input file watched for each job kind, relative to the repository root.
+WATCHED = {
+    "send": "questions.json",
+    "forward": os.path.join("forwarder", "forwardrange.txt"),
+    "delete": os.path.join("telegram_bulk_delete", "ranges", "delete_range.txt"),
+}
+TOOL_PATHS = {
+    "send_polls": "send_polls.py",
+    "forward": os.path.join("forwarder", "forward.py"),
+    "bulk_delete": os.path.join("telegram_bulk_delete", "scripts", "bulk_delete.py"),
+}
+_TOOLS = {}
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def load_tool(name):
+    """Imports a tool script once; later jobs reuse the module with its warm state."""
+    if name not in _TOOLS:
+        spec = importlib.util.spec_from_file_location(f"quizhub_{name}", os.path.join(REPO_ROOT, TOOL_PATHS[name]))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _TOOLS[name] = module
+    return _TOOLS[name]
+
+
+def preload_tools():
+    """
+    Imports every tool up front. An import blocks the event loop for seconds
+    (aiogram alone takes a while), so it is done before the control API starts
+    rather than in the middle of the first job. Tools whose libraries are
+    missing are skipped; their jobs fail with the ImportError instead.
+    """
+    for name in TOOL_PATHS:
+        try:
+            load_tool(name)
+        except ImportError as e:
+            logging.warning(f"Not preloading {name}: {e}")
+
+
+def repo_path(path):
+    """
+    Resolves a job's file argument against the repository root.
+    Raises ValueError for a path that resolves (symlinks included) outside the repository.
+    """
+    root = os.path.realpath(REPO_ROOT)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise ValueError(f"{path} is outside the repository")
+    return resolved
+
+
+def is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class JobFailed(Exception):
+    pass
+
+
+class Sessions:
+    """Bot pools that outlive single jobs; their bot sessions stay open until the dispatcher stops."""
+
+    def __init__(self):
+        self.stack = contextlib.AsyncExitStack()
+        self.pools = {}
+
+    async def pool(self, key, build):
+        if key not in self.pools:
+            pool = build()
+            for member in pool.members:
+                await self.stack.enter_async_context(member.bot)
+            self.pools[key] = pool
+        return self.pools[key]
+
+    async def close(self):
+        await self.stack.aclose()
+
+
+async def run_send(sessions, args):
+    tool = load_tool("send_polls")
+    preset = args.get("rate_preset", tool.RATE_LIMIT_PRESET)
+    pool = await sessions.pool(("send", preset), lambda: tool.make_bot_pool(preset))
+    tool.METRICS.reset()
+    # Same defaults as the workflow: only post what is not in the sent ledger yet.
+    await tool.process_items_in_batches(
+        repo_path(args.get("file", WATCHED["send"])), preset, args.get("fresh", False),
+        args.get("incremental", True), args.get("prune", False), False, args.get("validation", "strict"),
+        args.get("skip_duplicates", False), args.get("allow_empty_ledger", False), pool=pool,
+    )
+    return tool.METRICS.summary()
+
+
+async def run_forward(sessions, args):
+    tool = load_tool("forward")
+    pool = await sessions.pool(("forward", tool.RATE_LIMIT_PRESET), tool.make_bot_pool)
+    tool.METRICS.reset()
+    await tool.main(pool=pool, range_file=repo_path(args.get("file", WATCHED["forward"])), fresh=args.get("fresh", False))
+    return tool.METRICS.summary()
+
+
+async def run_delete(sessions, args):
+    tool = load_tool("bulk_delete")
+    pool = await sessions.pool(("delete", tool.RATE_LIMIT_PRESET),
+                               lambda: BotPool.from_tokens([tool.BOT_TOKEN or ""], tool.make_bot, tool.make_limiter))
+    member = pool.members[0]
+    tool.METRICS.reset()
+    start, end = tool.read_range_from_file(repo_path(args.get("file", WATCHED["delete"])))
+    counts = await tool.bulk_delete(start, end, bot=member.bot, limiter=member.limiter)
+    return {**counts, **tool.METRICS.summary()}
+
+
+RUNNERS = {"send": run_send, "forward": run_forward, "delete": run_delete}
+
+
+class Dispatcher:
+    def __init__(self, queue, watched=WATCHED, watch_interval=WATCH_INTERVAL, token=TOKEN):
+        """
+        `watched` maps job kinds to the input file that triggers them; a
+        non-empty `token` is required as a bearer token on every API request.
+        """
+        self.queue = queue
+        self.token = token
+        self.sessions = Sessions()
+        self.watched = watched
+        self.watch_interval = watch_interval
+        self.started = time.monotonic()
+        self.task = None
+        self._seen = {}
+
+    async def execute(self, job):
+        try:
+            return await RUNNERS[job.kind](self.sessions, job.args)
+        except SystemExit as e:
+            # The tools halt with SystemExit; inside a task it would take the whole loop down.
+            raise JobFailed(str(e.code)) from None
+
+    async def work(self):
+        """Runs queued jobs one after the other until cancelled."""
+        while True:
+            job = await self.queue.next()
+            logging.info(f"Starting {job.kind} job {job.id} {json.dumps(job.args)}.")
+            self.task = asyncio.create_task(self.execute(job))
+            try:
+                result = await self.task
+            except asyncio.CancelledError:
+                if not job.cancel_requested:
+                    # Shutting down: the job stays in the spool and resumes on the next start.
+                    raise
+                self.queue.finish(job, "cancelled")
+            except Exception as e:
+                logging.exception(f"Job {job.id} failed.")
+                self.queue.finish(job, "failed", error=f"{type(e).__name__}: {e}")
+            else:
+                self.queue.finish(job, "done", result=result)
+            finally:
+                self.task = None
+
+    def cancel(self, job_id):
+        job = self.queue.cancel(job_id)
+        if job is not None and job.cancel_requested and self.task is not None:
+            self.task.cancel()
+        return job
+
+    def _fingerprint(self, path):
+        try:
+            stat = os.stat(repo_path(path))
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    async def poll(self, watch=True):
+        """
+        Picks up new spool files and, with `watch`, queues a job when a watched
+        file changes. A change only counts once the file looks the same on two
+        consecutive polls, so an editor's or git's partial writes do not start a
+        job. The state at startup is the baseline.
+        """
+        pending = {}
+        for kind, path in self.watched.items():
+            self._seen[kind] = self._fingerprint(path)
+        while True:
+            await asyncio.sleep(self.watch_interval)
+            self.queue.scan()
+            if not watch:
+                continue
+            for kind, path in self.watched.items():
+                fingerprint = self._fingerprint(path)
+                if fingerprint is None or fingerprint == self._seen[kind]:
+                    pending.pop(kind, None)
+                elif pending.get(kind) != fingerprint:
+                    pending[kind] = fingerprint
+                else:
+                    del pending[kind]
+                    self._seen[kind] = fingerprint
+                    args = {"file": path}
+                    # A job that has not started yet will read the new contents anyway.
+                    if self.queue.find_queued(kind, args) is None:
+                        self.queue.submit(kind, args, source="watch")
+
+    def status(self):
+        return {
+            "uptime_seconds": round(time.monotonic() - self.started, 1),
+            "tools_loaded": sorted(_TOOLS),
+            "open_pools": [f"{kind}:{preset}" for kind, preset in self.sessions.pools],
+            "transport": CONNECTION_STATS.summary(),
+            **self.queue.snapshot(),
+        }
+
+    def route(self, method, path, body):
+        """Control API: returns (HTTP status, JSON payload)."""
+        parts = [part for part in path.split("?", 1)[0].split("/") if part]
+        if method == "GET" and parts in (["status"], ["jobs"]):
+            return 200, self.status()
+        if method == "GET" and len(parts) == 2 and parts[0] == "jobs":
+            job = self.queue.get(parts[1])
+            return (200, job.to_dict()) if job else (404, {"error": "no such job"})
+        if method == "POST" and parts == ["jobs"]:
+            try:
+                request = json.loads(body or b"{}")
+                if "file" in (request.get("args") or {}):
+                    repo_path(request["args"]["file"])
+                job = self.queue.submit(request["kind"], request.get("args"), request.get("priority"))
+            except (ValueError, KeyError, TypeError) as e:
+                return 400, {"error": f"invalid job: {e}"}
+            return 201, job.to_dict()
+        if (method == "POST" and len(parts) == 3 and parts[0] == "jobs" and parts[2] == "cancel") or \
+                (method == "DELETE" and len(parts) == 2 and parts[0] == "jobs"):
+            job = self.cancel(parts[1])
+            return (202, job.to_dict()) if job else (404, {"error": "no such job"})
+        return 404, {"error": "unknown endpoint"}
+
+    def authorized(self, headers):
+        if not self.token:
+            return True
+        scheme, _, credentials = headers.get("authorization", "").partition(" ")
+        return scheme.lower() == "bearer" and hmac.compare_digest(credentials.strip().encode(), self.token.encode())
+
+    async def handle_http(self, reader, writer):
+        """Just enough HTTP/1.1 for curl and scripts: one request per connection."""
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            headers = {}
+            while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", 0) or 0))
+            if len(request_line) < 2:
+                status, payload = 400, {"error": "bad request"}
+            elif not self.authorized(headers):
+                status, payload = 401, {"error": "missing or wrong bearer token"}
+            else:
+                status, payload = self.route(request_line[0].upper(), request_line[1], body)
+        except (ValueError, asyncio.IncompleteReadError) as e:
+            status, payload = 400, {"error": f"bad request: {e}"}
+        data = json.dumps(payload, ensure_ascii=False, indent=2).encode("utf-8")
+        writer.write(f"HTTP/1.1 {status} {'OK' if status < 400 else 'Error'}\r\n"
+                     f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                     f"Connection: close\r\n\r\n".encode("latin-1") + data)
+        with contextlib.suppress(ConnectionError):
+            await writer.drain()
+        writer.close()
+
+    async def serve(self, host=HOST, port=PORT, watch=True):
+        preload_tools()
+        server = await asyncio.start_server(self.handle_http, host, port)
+        logging.info(f"Dispatcher listening on http://{host}:{port} (spool: {self.queue.directory}).")
+        self.queue.scan()
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            with contextlib.suppress(NotImplementedError):
+                loop.add_signal_handler(signum, stop.set)
+        background = [asyncio.create_task(self.work()), asyncio.create_task(self.poll(watch))]
+        try:
+            async with server:
+                await stop.wait()
+        finally:
+            logging.info("Stopping; unfinished jobs stay in the spool.")
+            for task in background:
+                task.cancel()
+            await asyncio.gather(*background, return_exceptions=True)
+            await self.sessions.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run queued send, forward and delete jobs over warm sessions.")
+    parser.add_argument("--host", default=HOST,
+                        help="Control API address (default: %(default)s). A non-loopback address requires $QUIZHUB_DAEMON_TOKEN.")
+    parser.add_argument("--port", type=int, default=PORT, help="Control API port (default: %(default)s, or $QUIZHUB_DAEMON_PORT).")
+    parser.add_argument("--no-watch", dest="watch", action="store_false",
+                        help="Only run jobs from the spool and the control API.")
+    parser.add_argument("--interval", type=float, default=WATCH_INTERVAL,
+                        help="Seconds between file and spool polls (default: %(default)s).")
+    args = parser.parse_args()
+
+    try:
+        from dotenv import load_dotenv
+        load_dotenv(override=True)
+    except ImportError:
+        pass
+    token = os.getenv("QUIZHUB_DAEMON_TOKEN", "")
+    if not (is_loopback(args.host) or token):
+        parser.error(f"--host {args.host} is not a loopback address; set QUIZHUB_DAEMON_TOKEN to expose the control API.")
+    dispatcher = Dispatcher(JobQueue(), watch_interval=args.interval, token=token)
+    asyncio.run(dispatcher.serve(args.host, args.port, args.watch))
+
+
+if __name__ == "__main__":
+    main()
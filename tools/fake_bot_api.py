@@ -0,0 +1,253 @@
+"""
+A local stand-in for the Telegram Bot API, for measuring the send paths without
+touching a real channel.
+
+Implements getMe, sendPoll, sendMessage, copyMessage, copyMessages,
+deleteMessage and deleteMessages at /bot<token>/<method>, and can inject
+latency, 429 RetryAfter responses, "message to copy not found" errors and
+timeouts. Point a script at it with TELEGRAM_API_URL:
+
+    python tools/fake_bot_api.py --port 8081 --latency-ms 40 --retry-after-rate 0.01
+    TELEGRAM_API_URL=http://127.0.0.1:8081 BOT_TOKEN=1:fake CHAT_ID=-1001 \\
+        QUIZHUB_BENCHMARK=1 RATE_LIMIT_PRESET=unlimited python send_polls.py questions.json
+
+tools/benchmark.py starts it in-process and reads its per-method statistics.
+"""
+import argparse
+import email.parser
+import email.policy
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}
+
+
+class FaultConfig:
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, retry_after_rate=0.0, retry_after_seconds=1,
+                 missing_rate=0.0, timeout_rate=0.0, timeout_seconds=30.0, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.retry_after_rate = retry_after_rate
+        self.retry_after_seconds = retry_after_seconds
+        self.missing_rate = missing_rate
+        self.timeout_rate = timeout_rate
+        self.timeout_seconds = timeout_seconds
+        self.random = random.Random(seed)
+
+
+class ApiError(Exception):
+    def __init__(self, status, description, parameters=None):
+        super().__init__(description)
+        self.status = status
+        self.description = description
+        self.parameters = parameters
+
+
+class FakeBotApi:
+    """Request handling and statistics, independent of the HTTP plumbing."""
+
+    def __init__(self, faults):
+        self.faults = faults
+        self.lock = threading.Lock()
+        self.message_ids = itertools.count(1)
+        self.latencies = {}
+        self.errors = {}
+
+    def _chance(self, rate):
+        with self.lock:
+            return rate > 0 and self.faults.random.random() < rate
+
+    def _message(self, params, **extra):
+        with self.lock:
+            message_id = next(self.message_ids)
+        chat_id = params.get("chat_id")
+        return {"message_id": message_id, "date": int(time.time()),
+                "chat": {"id": chat_id if isinstance(chat_id, int) else -1000000000001, "type": "channel"}, **extra}
+
+    def _missing(self):
+        return self._chance(self.faults.missing_rate)
+
+    def handle(self, method, params):
+        """Returns the `result` for a call or raises ApiError."""
+        if method == "getMe":
+            return BOT_USER
+        if self._chance(self.faults.retry_after_rate):
+            seconds = self.faults.retry_after_seconds
+            raise ApiError(429, f"Too Many Requests: retry after {seconds}", {"retry_after": seconds})
+
+        if method == "sendMessage":
+            return self._message(params, text=params.get("text", ""))
+        if method == "sendPoll":
+            options = [{"text": str(option), "voter_count": 0} for option in params.get("options", [])]
+            poll = {
+                "id": str(random.getrandbits(63)), "question": params.get("question", ""), "options": options,
+                "total_voter_count": 0, "is_closed": False, "is_anonymous": True,
+                "type": params.get("type", "regular"), "allows_multiple_answers": False,
+            }
+            if params.get("correct_option_id") is not None:
+                poll["correct_option_id"] = params["correct_option_id"]
+            return self._message(params, poll=poll)
+        if method == "copyMessage":
+            if self._missing():
+                raise ApiError(400, "Bad Request: message to copy not found")
+            return {"message_id": self._message(params)["message_id"]}
+        if method == "copyMessages":
+            # Like Telegram, silently skip the IDs that cannot be copied.
+            return [{"message_id": self._message(params)["message_id"]}
+                    for _ in params.get("message_ids", []) if not self._missing()]
+        if method == "deleteMessage":
+            if self._missing():
+                raise ApiError(400, "Bad Request: message to delete not found")
+            return True
+        if method == "deleteMessages":
+            return True
+        raise ApiError(404, "Not Found: method not found")
+
+    def record(self, method, seconds, error=None):
+        with self.lock:
+            self.latencies.setdefault(method, []).append(seconds)
+            if error:
+                self.errors.setdefault(method, {}).setdefault(error, 0)
+                self.errors[method][error] += 1
+
+    def reset_stats(self):
+        with self.lock:
+            self.latencies = {}
+            self.errors = {}
+
+    def stats(self):
+        """{method: {calls, p50_ms, p99_ms, errors}} over the calls recorded so far."""
+        with self.lock:
+            summary = {}
+            for method, samples in self.latencies.items():
+                ordered = sorted(samples)
+                summary[method] = {
+                    "calls": len(ordered),
+                    "p50_ms": round(percentile(ordered, 50) * 1000, 2),
+                    "p99_ms": round(percentile(ordered, 99) * 1000, 2),
+                    "errors": dict(self.errors.get(method, {})),
+                }
+            return summary
+
+
+def percentile(ordered, pct):
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def decode_value(value):
+    """Form fields carry lists and numbers JSON-encoded; plain strings stay strings."""
+    try:
+        return json.loads(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def parse_params(content_type, body):
+    content_type = content_type or ""
+    if not body:
+        return {}
+    if content_type.startswith("application/json"):
+        return json.loads(body)
+    if content_type.startswith("multipart/form-data"):
+        message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+            b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + body
+        )
+        return {
+            part.get_param("name", header="content-disposition"): decode_value(part.get_content())
+            for part in message.iter_parts()
+        }
+    return {key: decode_value(values[-1]) for key, values in parse_qs(body.decode("utf-8")).items()}
+
+
+def make_handler(api):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body go out as separate writes; without this, delayed
+        # ACKs add ~40 ms to every keep-alive round trip.
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            started = time.perf_counter()
+            method = self.path.rstrip("/").rsplit("/", 1)[-1]
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            faults = api.faults
+            if api._chance(faults.timeout_rate):
+                time.sleep(faults.timeout_seconds)
+                api.record(method, time.perf_counter() - started, "timeout")
+                self.close_connection = True
+                return
+            delay = faults.latency_ms + (api.faults.random.uniform(-1, 1) * faults.jitter_ms if faults.jitter_ms else 0)
+            if delay > 0:
+                time.sleep(delay / 1000)
+            try:
+                result = api.handle(method, parse_params(self.headers.get("Content-Type"), body))
+                status, payload, error = 200, {"ok": True, "result": result}, None
+            except ApiError as e:
+                status, error = e.status, e.description
+                payload = {"ok": False, "error_code": e.status, "description": e.description}
+                if e.parameters:
+                    payload["parameters"] = e.parameters
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            api.record(method, time.perf_counter() - started, error)
+
+        do_GET = do_POST
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start_server(faults=None, host="127.0.0.1", port=0):
+    """Starts the fake API on a background thread; returns (server, api, base_url)."""
+    api = FakeBotApi(faults or FaultConfig())
+    server = ThreadingHTTPServer((host, port), make_handler(api))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, api, f"http://{host}:{server.server_address[1]}"
+
+
+def add_fault_arguments(parser):
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Base latency added to every call.")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform +/- jitter on the latency.")
+    parser.add_argument("--retry-after-rate", type=float, default=0.0, help="Probability of a 429 RetryAfter.")
+    parser.add_argument("--retry-after-seconds", type=int, default=1, help="retry_after value of injected 429s.")
+    parser.add_argument("--missing-rate", type=float, default=0.0, help="Probability a copied/deleted message is missing.")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="Probability a call hangs past the client timeout.")
+    parser.add_argument("--timeout-seconds", type=float, default=30.0, help="How long an injected timeout hangs.")
+    parser.add_argument("--seed", type=int, help="Random seed for reproducible fault injection.")
+
+
+def faults_from_args(args):
+    return FaultConfig(args.latency_ms, args.jitter_ms, args.retry_after_rate, args.retry_after_seconds,
+                       args.missing_rate, args.timeout_rate, args.timeout_seconds, args.seed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a fake Telegram Bot API server for local testing.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    server, api, base_url = start_server(faults_from_args(args), args.host, args.port)
+    print(f"Fake Bot API listening on {base_url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print(json.dumps(api.stats(), indent=2))
+        server.shutdown()
@@ -0,0 +1,115 @@
+"""
+Reports near-duplicate questions across question files (see common/dedup.py).
+
+Accepts the same inputs as tools/compile_deck.py: questions.json-style arrays
+and quizzes/**.json files, in any mix of files and directories. The earliest
+copy of a question counts as the original and every later copy as its
+duplicate.
+
+    python tools/find_duplicates.py                                  # questions.json and quizzes/
+    python tools/find_duplicates.py questions.json quizzes --threshold 0.8
+    python tools/find_duplicates.py questions.json --write questions.dedup.json
+    python tools/find_duplicates.py --json duplicates.json --fail    # for CI
+
+--write keeps only the originals of a single questions.json-style input.
+send_polls.py --skip-duplicates does the same on the fly. Pairs that look
+alike but have different answers are reported as conflicts and never removed.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common import REPO_ROOT
+from common.dedup import DEFAULT_THRESHOLD, NearDuplicateIndex
+from common.deck import iter_items, iter_source_questions
+from tools.compile_deck import expand_inputs
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+DEFAULT_INPUTS = [os.path.join(REPO_ROOT, "questions.json"), os.path.join(REPO_ROOT, "quizzes")]
+# Pairs logged in full; the JSON report always has all of them.
+LOG_LIMIT = 50
+
+
+def location(path, q_idx):
+    path = os.path.abspath(path)
+    if path.startswith(REPO_ROOT + os.sep):
+        path = os.path.relpath(path, REPO_ROOT)
+    return f"{path} #{q_idx + 1}"
+
+
+def index_sources(paths, threshold=DEFAULT_THRESHOLD):
+    index = NearDuplicateIndex(threshold)
+    questions = {}
+    for path in expand_inputs(paths):
+        for q_idx, raw in enumerate(iter_source_questions(path)):
+            position = index.add_item(location(path, q_idx), raw)
+            if position is not None:
+                questions[position] = raw.get("question", "")
+    return index, questions
+
+
+def report(index, questions, duplicates, conflicts):
+    entries = {
+        "duplicates": [
+            {"item": index.keys[later], "original": index.keys[index.original(duplicates, later)],
+             "matches": index.keys[earlier], "similarity": round(score, 3), "question": questions[later]}
+            for later, (earlier, score) in sorted(duplicates.items())
+        ],
+        "conflicts": [
+            {"items": [index.keys[earlier], index.keys[later]], "similarity": round(score, 3),
+             "questions": [questions[earlier], questions[later]]}
+            for earlier, later, score in conflicts
+        ],
+    }
+    for entry in entries["duplicates"][:LOG_LIMIT]:
+        logging.warning(f"Near-duplicate: {entry['item']} ~ {entry['matches']} ({entry['similarity']:.2f}): {entry['question'][:80]}")
+    for entry in entries["conflicts"][:LOG_LIMIT]:
+        logging.warning(f"Same question, different answer: {' ~ '.join(entry['items'])} ({entry['similarity']:.2f})")
+    hidden = max(0, len(entries["duplicates"]) - LOG_LIMIT) + max(0, len(entries["conflicts"]) - LOG_LIMIT)
+    if hidden:
+        logging.info(f"... and {hidden} more; use --json for the full list.")
+    return entries
+
+
+def write_filtered(source, out_path, index, duplicates):
+    """Copies a questions.json-style array without the items that duplicate an earlier one."""
+    dropped = {index.keys[position] for position in duplicates}
+    kept = [item for q_idx, item in enumerate(iter_items(source)) if location(source, q_idx) not in dropped]
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(kept, f, ensure_ascii=False, indent=4)
+        f.write("\n")
+    logging.info(f"Wrote {len(kept)} items to {out_path} ({len(dropped)} near-duplicates removed).")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find near-duplicate questions with a MinHash/LSH index.")
+    parser.add_argument("inputs", nargs="*", help="Question files or directories (default: questions.json and quizzes/).")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Jaccard similarity from which two questions count as duplicates (default: %(default)s).")
+    parser.add_argument("--json", dest="json_out", help="Write the full report to this file.")
+    parser.add_argument("--write", help="With a single questions.json-style input, write a copy without the duplicates.")
+    parser.add_argument("--fail", action="store_true", help="Exit with status 1 if any duplicates were found.")
+    args = parser.parse_args()
+
+    inputs = args.inputs or [path for path in DEFAULT_INPUTS if os.path.exists(path)]
+    if args.write and (len(inputs) != 1 or not os.path.isfile(inputs[0])):
+        parser.error("--write needs exactly one input file.")
+
+    start = time.perf_counter()
+    index, questions = index_sources(inputs, args.threshold)
+    duplicates, conflicts = index.find()
+    logging.info(f"Indexed {len(index)} questions in {time.perf_counter() - start:.2f}s: "
+                 f"{len(duplicates)} near-duplicates, {len(conflicts)} conflicting pairs.")
+    entries = report(index, questions, duplicates, conflicts)
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(entries, f, ensure_ascii=False, indent=2)
+    if args.write:
+        write_filtered(inputs[0], args.write, index, duplicates)
+    if args.fail and duplicates:
+        sys.exit(1)